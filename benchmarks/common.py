@@ -0,0 +1,54 @@
+import os
+
+# Must be set before pygame gets imported
+os.environ.setdefault( "SDL_VIDEODRIVER", "dummy" )
+os.environ.setdefault( "SDL_AUDIODRIVER", "dummy" )
+os.environ.setdefault( "PYGAME_HIDE_SUPPORT_PROMPT", "1" )
+
+import numpy
+from code.map_format import TILE_EMPTY, write_binary_map
+
+
+# Synthetic maps layers, same as the demo map
+MAP_LAYERS = [ "water", "ground", "main", "ceiling" ]
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def headless():
+	"""Open a hidden display, enough to load and convert surfaces"""
+	import pygame
+	from code.settings import SCREEN_HEIGHT, SCREEN_WIDTH
+	pygame.display.init()
+	pygame.font.init()
+	if not pygame.display.get_surface():
+		pygame.display.set_mode( (SCREEN_WIDTH, SCREEN_HEIGHT) )
+	return pygame.display.get_surface()
+
+
+def write_synthetic_map(folder, name, width, height, seed = 0):
+	"""Write a @width x @height tiles binary map: walkable ground, a water border, scattered water and wall cells"""
+	rng = numpy.random.default_rng(seed)
+	shape = (height, width)
+
+	water = numpy.full( shape, TILE_EMPTY )
+	ground = numpy.full( shape, 1 )
+	main = numpy.full( shape, TILE_EMPTY )
+	ceiling = numpy.full( shape, TILE_EMPTY )
+
+	# Border
+	water[0, :] = water[-1, :] = water[:, 0] = water[:, -1] = 0
+	ground[water == 0] = TILE_EMPTY
+
+	# Obstacles (roughly 2% water, 3% walls) and a few clouds
+	noise = rng.random(shape)
+	ponds = (noise < 0.02) & (ground != TILE_EMPTY)
+	water[ponds] = 0
+	ground[ponds] = TILE_EMPTY
+	main[(noise > 0.97)] = 2
+	ceiling[(noise > 0.5) & (noise < 0.51)] = 3
+
+	layers = dict( zip( MAP_LAYERS, (water, ground, main, ceiling) ) )
+	write_binary_map( os.path.join( folder, "{}.map".format(name) ), layers )
+	return layers
@@ -0,0 +1,145 @@
+#
+# End-to-end frame times of the rendering_demo world: headless, seeded and uncapped (no clock.tick)
+#
+#	python -m benchmarks.frames --frames 600 --npcs 50 --explosions 0.5 --map-size 128 --debug
+#
+
+import argparse
+import json
+import tempfile
+import time
+import numpy
+
+from benchmarks.common import headless, write_synthetic_map
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def percentiles(samples):
+	"""p50/p95/p99/max (milliseconds) of a list of durations in seconds"""
+	if not samples: return {}
+	values = numpy.array(samples) * 1000.0
+	return {
+		"p50": round( float(numpy.percentile(values, 50)), 3 ),
+		"p95": round( float(numpy.percentile(values, 95)), 3 ),
+		"p99": round( float(numpy.percentile(values, 99)), 3 ),
+		"max": round( float(values.max()), 3 )
+	}
+
+
+def time_processors(world, timings):
+	"""Wrap each processor of @world to append its process() durations to @timings[processor name]"""
+	for processor in world._processors:
+		name = type(processor).__name__
+		samples = timings.setdefault( name, [] )
+
+		def timed(*args, _process = processor.process, _samples = samples, **kwargs):
+			start = time.perf_counter()
+			ret = _process(*args, **kwargs)
+			_samples.append( time.perf_counter() - start )
+			return ret
+
+		processor.process = timed
+
+
+def start_game(options, debug):
+	"""Create a GameManager and start a new rendering_demo game with the given world @options"""
+	from code.events import event_bus
+	from code.game_manager import GameManager
+
+	manager = GameManager()
+	manager.world.world_options["rendering_demo"] = options
+	event_bus.post("game_new")
+	event_bus.flush()
+	manager.world.finish_loading()
+
+	if debug:
+		manager.debug = True
+		event_bus.post("toggle_debug", True)
+
+	return manager
+
+
+def run_frames(manager, frames, warmup, explosions_per_frame, on_frame = None):
+	"""Run @warmup + @frames uncapped frames, returns (frame durations, processor durations)"""
+	from code.components.controller import PlayerController
+	from code.components.physics import PhysicsBody
+	from code.systems.input import InputHandler
+	from code.settings import FPS_LIMIT
+
+	world = manager.world.worlds[manager.world.current]
+	spawner = world.get_processor(InputHandler)
+	player = world.get_components(PhysicsBody, PlayerController)[0][1][0]
+
+	timings = {}
+	frame_times = []
+	explosions = 0.0
+	for frame in range(warmup + frames):
+		# Processors timings start after warmup
+		if frame == warmup: time_processors( world, timings )
+
+		start = time.perf_counter()
+
+		if on_frame: on_frame(frame)
+
+		# Same as holding "b", at a fixed rate
+		explosions += explosions_per_frame
+		while explosions >= 1.0:
+			spawner._test_spawn_explosion(player.position)
+			explosions -= 1.0
+
+		# Simulated time advances at the target rate whatever the real frame time, runs stay repeatable
+		manager.frame( 1.0 / FPS_LIMIT )
+		manager.present()
+
+		if frame >= warmup: frame_times.append( time.perf_counter() - start )
+
+	return frame_times, timings
+
+
+def report(frame_times, timings, parameters):
+	"""Frame times summary, as a JSON-friendly dict"""
+	total = sum(frame_times)
+	return {
+		"parameters": 	parameters,
+		"frames": 		len(frame_times),
+		"fps": 			round( len(frame_times) / total, 2 ) if total else 0.0,
+		"frame_ms": 	percentiles(frame_times),
+		"processors_ms": { name: percentiles(samples) for name, samples in timings.items() }
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Headless, seeded and uncapped rendering_demo frame times")
+	parser.add_argument("--frames", type = int, default = 600)
+	parser.add_argument("--warmup", type = int, default = 30, help = "frames excluded from the report")
+	parser.add_argument("--seed", type = int, default = 0)
+	parser.add_argument("--npcs", type = int, default = None, help = "npcs count (default: random 5-20)")
+	parser.add_argument("--explosions", type = float, default = 0.0, help = "explosions spawned per frame")
+	parser.add_argument("--map-size", type = int, default = 0, help = "synthetic map width and height in tiles (default: demo map)")
+	parser.add_argument("--debug", action = "store_true", help = "render debug frames")
+	parser.add_argument("--output", default = None, help = "also write the report to this file")
+	args = parser.parse_args()
+
+	headless()
+
+	with tempfile.TemporaryDirectory() as map_folder:
+		options = { "npcs": args.npcs, "seed": args.seed }
+		if args.map_size:
+			write_synthetic_map( map_folder, "bench", args.map_size, args.map_size, args.seed )
+			options.update( map_name = "bench", map_folder = map_folder )
+
+		manager = start_game( options, args.debug )
+		frame_times, timings = run_frames( manager, args.frames, args.warmup, args.explosions )
+
+	result = report( frame_times, timings, vars(args) )
+	output = json.dumps( result, indent = 2 )
+	print(output)
+	if args.output:
+		with open( args.output, "w" ) as fout:
+			fout.write(output)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,176 @@
+#
+# Python heap bytes per entity (components included, shared surfaces excluded) for the rendering_demo
+# entity kinds: unbaked walls, npcs and pooled explosions. Each kind is measured with the slotted components
+# and with plain copies of them (attributes in a __dict__, as before slotting), plus per component sizes
+#
+#	python -m benchmarks.memory --entities 2000
+#
+
+import argparse
+import contextlib
+import importlib
+import json
+import pkgutil
+import sys
+import tracemalloc
+
+from benchmarks.common import headless
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def create_walls(world, count):
+	"""Single wall cells, as spawned before walls baking: a sprite and its collider"""
+	import pygame
+	from code.components.hitbox import Hitbox
+	from code.components.sprite import StaticSprite
+	from code.settings import RENDERING_LAYERS, SPRITE_WALL, TILE_SIZE
+
+	for index in range(count):
+		spawn = ( (index % 256) * TILE_SIZE, (index // 256) * TILE_SIZE )
+		sprite = StaticSprite( file_name = SPRITE_WALL, layer = RENDERING_LAYERS["main"], spawn_point = spawn )
+		world.create_entity( sprite, Hitbox( reference_rect = pygame.Rect(sprite.rect) ) )
+
+
+def create_npcs(world, count):
+	"""rendering_demo npcs (animated and static, random scales)"""
+	from code.worlds.rendering_demo import create_random_npcs
+	create_random_npcs( world, 256 * 48, 256 * 48, count )
+
+
+def create_explosions(world, count):
+	"""Live pooled explosions"""
+	from code.effects import EffectPool
+	from code.settings import ANIM_DURATION_EXPLOSION, ANIM_SPEED_EXPLOSION, ANIM_TABLE_EXPLOSION
+	from code.utils import rng
+
+	pool = EffectPool(	folder = "explosions",
+						frames_table = ANIM_TABLE_EXPLOSION,
+						duration = ANIM_DURATION_EXPLOSION,
+						speed = ANIM_SPEED_EXPLOSION,
+						ceiling = count )
+	for _ in range(count):
+		pool.spawn( world, ( rng.randint(0, 4096), rng.randint(0, 4096) ), rng.randint(48, 256) )
+
+
+KINDS = {
+	"walls": 		create_walls,
+	"npcs": 		create_npcs,
+	"explosions": 	create_explosions
+}
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def slotted_components():
+	"""Slotted classes of the code.components modules, except the ones calling super() (see unslotted)"""
+	import code.components
+
+	classes = []
+	for module_info in pkgutil.iter_modules( code.components.__path__ ):
+		module = importlib.import_module( "code.components.{}".format(module_info.name) )
+		for value in vars(module).values():
+			if not isinstance(value, type) or value.__module__ != module.__name__ or "__slots__" not in vars(value): continue
+			# Copied methods would still call super() on the original class
+			if any( "__class__" in item.__code__.co_freevars for item in vars(value).values() if hasattr(item, "__code__") ): continue
+			classes.append(value)
+	return classes
+
+
+def unslotted(cls):
+	"""Copy of @cls without __slots__: instances keep their attributes in a __dict__"""
+	slots = set( vars(cls)["__slots__"] )
+	namespace = { key: value for key, value in vars(cls).items() if key not in slots and key not in ( "__slots__", "__dict__", "__weakref__" ) }
+	return type( cls.__name__, cls.__bases__, namespace )
+
+
+def _rebind(classes):
+	"""Replace the @classes keys by their values in every loaded code module"""
+	for name, module in list( sys.modules.items() ):
+		if module is None or not name.startswith("code."): continue
+		for attribute, value in list( vars(module).items() ):
+			if isinstance(value, type) and value in classes: setattr( module, attribute, classes[value] )
+
+
+@contextlib.contextmanager
+def plain_components():
+	"""Create unslotted copies of the slotted components meanwhile (modules imported meanwhile included)"""
+	classes = { cls: unslotted(cls) for cls in slotted_components() }
+	_rebind(classes)
+	try:
+		yield
+	finally:
+		_rebind( { plain: cls for cls, plain in classes.items() } )
+
+
+def component_sizes(world):
+	"""Average bytes of each component type of @world: the instance and its __dict__, attribute values excluded"""
+	sizes = {}
+	for components in world._entities.values():
+		for component in components.values():
+			size = sys.getsizeof(component)
+			if hasattr( component, "__dict__" ): size += sys.getsizeof( vars(component) )
+			sizes.setdefault( type(component).__name__, [] ).append(size)
+	return { name: round( sum(items) / len(items), 1 ) for name, items in sorted( sizes.items() ) }
+
+
+def measure(create, count, seed):
+	"""Heap bytes per entity allocated by @create (frames and surfaces are loaded by a same seed warm-up run
+	first), and the component sizes (see component_sizes)
+	"""
+	from code.utils import rng
+	from code.world import World
+
+	rng.seed(seed)
+	create( World(), count )
+
+	rng.seed(seed)
+	world = World()
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	create( world, count )
+	allocated = tracemalloc.get_traced_memory()[0] - before
+	tracemalloc.stop()
+
+	return round( allocated / count, 1 ), component_sizes(world)
+
+
+def compare(create, count, seed):
+	"""Plain and slotted components measurements of @create, side by side"""
+	with plain_components():
+		plain, plain_components_sizes = measure( create, count, seed )
+	slotted, components = measure( create, count, seed )
+
+	return {
+		"bytes_per_entity": { "plain": plain, "slotted": slotted, "saved": round( plain - slotted, 1 ) },
+		"component_bytes": 	{
+			name: { "plain": plain_components_sizes.get(name), "slotted": size } for name, size in components.items()
+		}
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Python heap bytes per entity and per component, plain against slotted components")
+	parser.add_argument("--entities", type = int, default = 2000, help = "entities created per kind")
+	parser.add_argument("--seed", type = int, default = 0)
+	parser.add_argument("--output", default = None, help = "also write the report to this file")
+	args = parser.parse_args()
+
+	headless()
+
+	result = {
+		"parameters": 	vars(args),
+		"kinds": 		{ kind: compare( create, args.entities, args.seed ) for kind, create in KINDS.items() }
+	}
+
+	output = json.dumps( result, indent = 2 )
+	print(output)
+	if args.output:
+		with open( args.output, "w" ) as fout:
+			fout.write(output)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,105 @@
+#
+# Physics throughput: PhysicsSimulation (one body at a time) against BatchedPhysicsSimulation (numpy arrays)
+#
+#	python -m benchmarks.physics --bodies 100 1000 5000 --steps 120
+#
+
+import argparse
+import json
+import random
+import tempfile
+import time
+
+from benchmarks.common import MAP_LAYERS, headless, write_synthetic_map
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def build_world(map_folder, bodies, seed):
+	"""A world with a synthetic map and @bodies dinosaurs spawned on walkable cells"""
+	import pygame
+	from code.components.hitbox import Hitbox
+	from code.components.map import TileMap
+	from code.components.physics import PhysicsBody
+	from code.components.sprite import AnimatedSprite
+	from code.settings import ANIM_TABLE_DINOSAUR, TILE_SIZE
+	from code.world import World
+	from code.worlds.rendering_demo import create_tileset
+
+	rng = random.Random(seed)
+	world = World()
+
+	tilemap = TileMap( "bench", MAP_LAYERS, create_tileset(), folder = map_folder )
+	world.create_entity( tilemap )
+
+	# Spawn bodies on free cells only
+	free_cells = [ tuple(cell) for cell in zip( *tilemap.walkable.nonzero() ) ]
+	for cell_y, cell_x in rng.sample( free_cells, bodies ):
+		spawn = ( cell_x * TILE_SIZE + TILE_SIZE // 2, cell_y * TILE_SIZE + TILE_SIZE // 2 )
+		sprite = AnimatedSprite( folder = "dinosaur", frames_table = ANIM_TABLE_DINOSAUR, scale_size = (48, 48), spawn_point = spawn )
+		hitbox = Hitbox( scale_factor_x = -50, scale_factor_y = -60, reference_rect = sprite.rect )
+		world.create_entity( sprite, hitbox, PhysicsBody( position = pygame.Vector2(spawn) ) )
+
+	return world, tilemap.world_width, tilemap.world_height
+
+
+def run(simulation_type, map_folder, bodies, steps, seed, collisions):
+	"""Simulate @steps fixed steps, changing bodies directions every 10 steps. Returns (seconds, final positions)"""
+	import pygame
+	from code.components.physics import PhysicsBody
+
+	world, width, height = build_world( map_folder, bodies, seed )
+	simulation = simulation_type( bounding_rect = (0, 0, width, height) )
+	simulation.collisions_enabled = collisions
+	world.add_processor( simulation )
+	world.process(0) 	# Setup references and broad phase grids (bodies are at rest, nothing moves)
+
+	rng = random.Random(seed)
+	elapsed = 0.0
+	for batch in range(0, steps, 10):
+		# Random walk
+		for ent, body in world.get_component(PhysicsBody):
+			body.direction = pygame.Vector2( rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)) )
+		start = time.perf_counter()
+		simulation.simulate( min(10, steps - batch) )
+		elapsed += time.perf_counter() - start
+
+	positions = { ent: tuple(body.position) for ent, body in world.get_component(PhysicsBody) }
+	return elapsed, positions
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Physics bodies/second, per body against batched integration")
+	parser.add_argument("--bodies", type = int, nargs = "+", default = [ 100, 1000 ])
+	parser.add_argument("--steps", type = int, default = 120)
+	parser.add_argument("--map-size", type = int, default = 256, help = "map width and height, in tiles")
+	parser.add_argument("--seed", type = int, default = 0)
+	parser.add_argument("--no-collisions", dest = "collisions", action = "store_false", help = "integration only")
+	args = parser.parse_args()
+
+	headless()
+	from code.systems.physics import BatchedPhysicsSimulation, PhysicsSimulation
+
+	results = []
+	with tempfile.TemporaryDirectory() as map_folder:
+		write_synthetic_map( map_folder, "bench", args.map_size, args.map_size, args.seed )
+
+		for bodies in args.bodies:
+			serial_time, serial_positions = run( PhysicsSimulation, map_folder, bodies, args.steps, args.seed, args.collisions )
+			batched_time, batched_positions = run( BatchedPhysicsSimulation, map_folder, bodies, args.steps, args.seed, args.collisions )
+			results.append({
+				"bodies": 					bodies,
+				"steps": 					args.steps,
+				"collisions": 				args.collisions,
+				"serial_bodies_per_sec": 	round( bodies * args.steps / serial_time ),
+				"batched_bodies_per_sec": 	round( bodies * args.steps / batched_time ),
+				"speedup": 					round( serial_time / batched_time, 2 ),
+				"same_positions": 			serial_positions == batched_positions
+			})
+
+	print( json.dumps( results, indent = 2 ) )
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,74 @@
+#
+# Frame times of a recorded game session (python launcher.py --record session.rec), replayed headless and
+# uncapped: same input, frame times, rng seed and worlds loading frames as the recording
+#
+#	python -m benchmarks.replay session.rec
+#
+
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.common import headless
+from benchmarks.frames import percentiles, report, time_processors
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def replay(path):
+	"""Replay the session saved at @path, returns (frame durations, { scene: frame durations }, processor durations, player)"""
+	from code.game_manager import GameManager
+	from code.replay import InputPlayer, InputSession
+
+	player = InputPlayer( InputSession.load(path) )
+	manager = GameManager( session = player )
+
+	timings = {}
+	timed = [] 	# Worlds whose processors are timed, kept alive so they are never timed twice
+	frame_times = []
+	scene_times = {}
+	while manager.running and not player.finished:
+		world = manager.world.worlds.get(manager.world.current)
+		if world is not None and not any( world is item for item in timed ):
+			time_processors( world, timings )
+			timed.append(world)
+
+		start = time.perf_counter()
+		manager.frame()
+		manager.present()
+		elapsed = time.perf_counter() - start
+
+		frame_times.append(elapsed)
+		scene_times.setdefault( manager.world.current or "quit", [] ).append(elapsed)
+
+	return frame_times, scene_times, timings, player
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Headless and uncapped frame times of a recorded game session")
+	parser.add_argument("session", help = "session file, see launcher.py --record")
+	parser.add_argument("--output", default = None, help = "also write the report to this file")
+	args = parser.parse_args()
+
+	headless()
+
+	frame_times, scene_times, timings, player = replay(args.session)
+
+	result = report( frame_times, timings, { "session": args.session, "seed": player.session.seed } )
+	result["scenes_ms"] = { scene: percentiles(samples) for scene, samples in scene_times.items() }
+	result["diverged"] 	= player.diverged
+
+	output = json.dumps( result, indent = 2 )
+	print(output)
+	if args.output:
+		with open( args.output, "w" ) as fout:
+			fout.write(output)
+
+	# A diverging replay does not measure the recorded session
+	sys.exit( 1 if result["diverged"] else 0 )
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,102 @@
+#
+# Time to first frame: each run launches a fresh, headless interpreter (imports included), the report is
+# checked against STARTUP_TARGET
+#
+#	python -m benchmarks.startup --runs 5
+#
+
+import time
+
+# Launch time of this process, taken before any other import
+STARTED = time.perf_counter()
+
+import argparse
+import json
+import subprocess
+import sys
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def child():
+	"""One launch, like launcher.py: prints the startup phases (seconds) as JSON"""
+	started = STARTED
+
+	# Same display/audio drivers as the other benchmarks
+	import benchmarks.common
+	from code.game_manager import GameManager
+	imported = time.perf_counter()
+
+	manager = GameManager(started)
+	created = time.perf_counter()
+
+	manager.frame()
+	manager.present()
+
+	# Main menu ready (loaded in the background meanwhile)
+	while manager.world.current != "main_menu":
+		manager.frame()
+		manager.present()
+
+	print( json.dumps( {
+		"import": 		imported - started,
+		"init": 		created - imported,
+		"first_frame": 	manager.first_frame,
+		"main_menu": 	time.perf_counter() - started
+	} ) )
+
+
+def run(runs):
+	"""Launch @runs children, returns { phase: [ seconds ] } plus the process "wall" time (interpreter start included)"""
+	phases = {}
+	for _ in range(runs):
+		start = time.perf_counter()
+		output = subprocess.run(
+			[ sys.executable, "-m", "benchmarks.startup", "--child" ],
+			check = True, capture_output = True, text = True
+		).stdout
+		wall = time.perf_counter() - start
+
+		result = json.loads( output.strip().splitlines()[-1] )
+		result["wall"] = wall
+		for phase, value in result.items():
+			phases.setdefault( phase, [] ).append(value)
+	return phases
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "Headless time to first frame, one fresh process per run")
+	parser.add_argument("--runs", type = int, default = 5)
+	parser.add_argument("--target", type = float, default = None, help = "p95 time to first frame (milliseconds, default: STARTUP_TARGET)")
+	parser.add_argument("--output", default = None, help = "also write the report to this file")
+	parser.add_argument("--child", action = "store_true", help = argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	# Nothing imported yet: the child measures the game imports too
+	if args.child: return child()
+
+	from benchmarks.frames import percentiles
+	from code.settings import STARTUP_TARGET
+	if args.target is None: args.target = STARTUP_TARGET
+
+	phases = run(args.runs)
+	first_frame = percentiles( phases["first_frame"] )
+	result = {
+		"parameters": 	{ "runs": args.runs, "target": args.target },
+		"phases_ms": 	{ phase: percentiles(samples) for phase, samples in phases.items() },
+		"target_met": 	first_frame["p95"] <= args.target
+	}
+
+	output = json.dumps( result, indent = 2 )
+	print(output)
+	if args.output:
+		with open( args.output, "w" ) as fout:
+			fout.write(output)
+
+	# Usable as a check
+	sys.exit( 0 if result["target_met"] else 1 )
+
+
+if __name__ == '__main__':
+	main()
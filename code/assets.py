@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from code.settings import ASSET_CACHE_BUDGET
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class SurfaceCache:
+	"""Process-wide LRU cache for decoded (and scaled) image surfaces, bounded by a byte budget"""
+
+	def __init__(self, budget = ASSET_CACHE_BUDGET):
+		self.budget 	= budget 		# Maximum amount of pixel bytes held by the cache
+		self.size 		= 0 			# Pixel bytes currently held by the cache
+		self.hits 		= 0
+		self.misses 	= 0
+		self.evictions 	= 0
+
+		# (path, scale size, alpha mode) => pygame.Surface, least recently used first
+		self._surfaces = OrderedDict()
+
+	@staticmethod
+	def surface_bytes(surface):
+		"""Memory used by @surface pixel data"""
+		return surface.get_pitch() * surface.get_height()
+
+	@property
+	def stats(self):
+		return {
+			"entries": 		len(self._surfaces),
+			"bytes": 		self.size,
+			"budget": 		self.budget,
+			"hits": 		self.hits,
+			"misses": 		self.misses,
+			"evictions": 	self.evictions
+		}
+
+	def __contains__(self, key):
+		return key in self._surfaces
+
+	def get(self, key):
+		"""Return the cached surface for @key (or None), marking it as the most recently used"""
+		surface = self._surfaces.get(key)
+		if surface is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self._surfaces.move_to_end(key)
+		return surface
+
+	def put(self, key, surface):
+		"""Store @surface under @key, evicting the least recently used entries when over budget"""
+		if key in self._surfaces:
+			self.size -= self.surface_bytes(self._surfaces.pop(key))
+
+		self._surfaces[key] = surface
+		self.size += self.surface_bytes(surface)
+
+		# Always keep the newest entry, even when it alone exceeds the budget
+		while self.size > self.budget and len(self._surfaces) > 1:
+			_, evicted = self._surfaces.popitem(last = False)
+			self.size -= self.surface_bytes(evicted)
+			self.evictions += 1
+
+		return surface
+
+	def clear(self):
+		"""Drop every cached surface (e.g. when the display mode changes)"""
+		self._surfaces.clear()
+		self.size = 0
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+# Shared by every sprite, tile and ui component. Cached surfaces must be treated as read-only
+surface_cache = SurfaceCache()
@@ -0,0 +1,289 @@
+#
+# Sprite atlas: the loose images of GRAPHICS_FOLDER packed into a few large pages, with a JSON index
+#
+#	index: 	{ "version": 3, "pages": [ file names ], "frames": { image path: [ page, x, y, w, h ] },
+#			  "folders": { folder path: [ image paths, as listed by code.utils.list_folder ] },
+#			  "sources": { image or folder path: content hash (see source_stamp) } }
+#
+# Packed images and folder listings whose source changed since the build are ignored (loaded from disk),
+# sources that are not there (e.g. not shipped) are trusted. Build (or rebuild, after changing the graphics) with:
+#
+#	python -m code.atlas
+#
+# Shipped builds only need the atlas and the images left out of it, staged (without the sources) with:
+#
+#	python -m code.atlas --stage build/graphics
+#
+
+import hashlib
+import json
+import os
+import shutil
+import pygame
+from code.settings import (
+	ATLAS_FOLDER,
+	ATLAS_MAX_IMAGE_SIZE,
+	ATLAS_PAGE_SIZE,
+	GRAPHICS_FOLDER
+)
+
+
+ATLAS_VERSION 	= 3
+ATLAS_INDEX 	= "atlas.json"
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class Atlas:
+	"""Atlas-backed images: each page is decoded and converted once, frames are subsurfaces of their page"""
+
+	def __init__(self, folder = ATLAS_FOLDER, graphics = GRAPHICS_FOLDER):
+		self.folder = folder
+		self.graphics = graphics 	# Source images folder
+		self.index 	= None 	# Loaded on first use, empty when no atlas has been built
+		self.pages 	= {} 	# page number => converted pygame.Surface
+		self.decoded = {} 	# page number => pygame.Surface not converted yet (see decode)
+		self.frames = {} 	# image path => subsurface
+
+	def load(self):
+		"""Read the atlas index (missing or outdated atlases are ignored, images are loaded one by one)
+
+		Frames and folder listings whose source file or folder changed since the build are dropped, missing
+		sources are not checked (staged builds, see stage_graphics).
+		"""
+		self.index = {}
+		path = os.path.join( self.folder, ATLAS_INDEX )
+		if not os.path.exists(path): return
+
+		with open(path) as fin:
+			index = json.load(fin)
+		if index.get("version") != ATLAS_VERSION: return
+
+		sources = index.get( "sources", {} )
+		def changed(name):
+			if name not in sources: return False
+			stamp = source_stamp( self.graphics, name, self.folder )
+			return stamp is not None and stamp != sources[name]
+
+		frames = index.get( "frames", {} )
+		for name in [ name for name in frames if changed(name) ]:
+			del frames[name]
+
+		# Listings include subfolders: a listing is outdated as soon as any folder below it changed
+		folders = index.get( "folders", {} )
+		outdated = [ name for name in folders if changed(name) ]
+		for name in list(folders):
+			if any( item == name or not name or item.startswith( name + "/" ) for item in outdated ):
+				del folders[name]
+		self.index = index
+
+	def reset(self):
+		"""Drop the converted pages (e.g. when the display mode changes), the index is kept"""
+		self.pages.clear()
+		self.decoded.clear()
+		self.frames.clear()
+
+	def page(self, number):
+		surface = self.pages.get(number)
+		if surface is None:
+			surface = self.decoded.pop( number, None ) or self.decode_page(number)
+			surface = self.pages[number] = surface.convert_alpha()
+		return surface
+
+	def decode_page(self, number):
+		return pygame.image.load( os.path.join( self.folder, self.index["pages"][number] ) )
+
+	def decode(self, name):
+		"""Decode the page of image @name ahead of time (no display calls, safe on worker threads). False when not packed"""
+		if self.index is None: self.load()
+		entry = self.index.get( "frames", {} ).get( name.replace( os.sep, "/" ) )
+		if not entry: return False
+
+		number = entry[0]
+		if number not in self.pages and number not in self.decoded:
+			self.decoded[number] = self.decode_page(number)
+		return True
+
+	def get(self, name):
+		"""Image @name (relative to GRAPHICS_FOLDER) as a subsurface of its page, None when not packed"""
+		frame = self.frames.get(name)
+		if frame is not None: return frame
+
+		if self.index is None: self.load()
+		entry = self.index.get( "frames", {} ).get( name.replace( os.sep, "/" ) )
+		if not entry: return None
+
+		frame = self.frames[name] = self.page( entry[0] ).subsurface( entry[1:] )
+		return frame
+
+	def listing(self, path):
+		"""Image paths in folder @path at build time, None when unknown"""
+		if self.index is None: self.load()
+		return self.index.get( "folders", {} ).get( path.replace( os.sep, "/" ) )
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def source_stamp(graphics, name, output = ATLAS_FOLDER):
+	"""Content hash of file @name, or of the entries of folder @name (relative to @graphics, the atlas @output
+	folder excluded), None when missing. Unlike modification times, it survives copies and fresh checkouts.
+	"""
+	path = os.path.join( graphics, name )
+	output = os.path.abspath(output)
+	try:
+		if os.path.isdir(path):
+			entries = sorted( entry for entry in os.listdir(path) if os.path.abspath( os.path.join( path, entry ) ) != output )
+			content = "\n".join(entries).encode("utf-8")
+		else:
+			with open( path, "rb" ) as fin:
+				content = fin.read()
+	except OSError:
+		return None
+	return hashlib.sha1(content).hexdigest()
+
+
+def pack(sizes, page_size):
+	"""Shelf packing of @sizes ({ key: (w, h) }, tallest first), returns { key: (page, x, y) }"""
+	positions = {}
+	page = x = y = shelf_height = 0
+
+	for key in sorted( sizes, key = lambda key: (-sizes[key][1], key) ):
+		width, height = sizes[key]
+
+		# Next shelf
+		if x + width > page_size:
+			x = 0
+			y += shelf_height
+			shelf_height = 0
+
+		# Next page
+		if y + height > page_size:
+			page += 1
+			x = y = shelf_height = 0
+
+		positions[key] = ( page, x, y )
+		x += width
+		shelf_height = max( shelf_height, height )
+	return positions
+
+
+def build_atlas(graphics = GRAPHICS_FOLDER, output = ATLAS_FOLDER, page_size = ATLAS_PAGE_SIZE, max_size = ATLAS_MAX_IMAGE_SIZE):
+	"""Pack the PNG images of @graphics (up to @max_size pixels per side) into @output, returns the index"""
+	from code.utils import walk_folder
+
+	output = os.path.abspath(output)
+	images = {}
+	folders = {}
+	sources = {}
+	for current_path, subfolders, files in os.walk(graphics):
+		# Skip previous builds
+		if os.path.abspath(current_path).startswith(output):
+			subfolders.clear()
+			continue
+
+		folder = os.path.relpath( current_path, graphics )
+		folder = "" if folder == os.curdir else folder.replace( os.sep, "/" )
+		# Images only, the atlas output folder excluded
+		folders[folder] = [
+			name for name in walk_folder( folder, graphics )
+			if name.lower().endswith(".png") and not os.path.abspath( os.path.join( graphics, name ) ).startswith( output + os.sep )
+		]
+		sources[folder] = source_stamp( graphics, folder, output )
+
+		for file_name in files:
+			if not file_name.lower().endswith(".png"): continue
+			name = file_name if not folder else "/".join( (folder, file_name) )
+			image = pygame.image.load( os.path.join( graphics, name ) )
+			if max( image.get_size() ) <= max_size:
+				images[name] = image
+				sources[name] = source_stamp( graphics, name, output )
+
+	positions = pack( { name: image.get_size() for name, image in images.items() }, page_size )
+
+	# Pages are cropped to their used area
+	extents = {}
+	for name, (page, x, y) in positions.items():
+		width, height = images[name].get_size()
+		used = extents.get( page, (0, 0) )
+		extents[page] = ( max( used[0], x + width ), max( used[1], y + height ) )
+
+	# Render pages
+	pages = {}
+	for name, (page, x, y) in positions.items():
+		if page not in pages:
+			pages[page] = pygame.Surface( extents[page], flags = pygame.SRCALPHA, depth = 32 )
+			pages[page].fill( (0, 0, 0, 0) )
+		pages[page].blit( images[name], (x, y) )
+
+	os.makedirs( output, exist_ok = True )
+	page_names = []
+	for page in sorted(pages):
+		page_names.append( "atlas_{}.png".format(page) )
+		pygame.image.save( pages[page], os.path.join( output, page_names[-1] ) )
+
+	index = {
+		"version": 	ATLAS_VERSION,
+		"pages": 	page_names,
+		"frames": 	{ name: [ page, x, y, *images[name].get_size() ] for name, (page, x, y) in sorted( positions.items() ) },
+		"folders": 	folders,
+		"sources": 	sources
+	}
+	with open( os.path.join( output, ATLAS_INDEX ), "w" ) as fout:
+		json.dump( index, fout, indent = 1 )
+	return index
+
+
+def stage_graphics(index, stage, graphics = GRAPHICS_FOLDER, output = ATLAS_FOLDER):
+	"""Copy the atlas @index pages and the images it does not pack from @graphics into @stage, returns the files count
+
+	The staged index has no sources: packed images are not shipped, so there is nothing to check them against.
+	"""
+	output = os.path.abspath(output)
+	staged_output = os.path.join( stage, os.path.relpath( output, graphics ) )
+	if os.path.exists(stage): shutil.rmtree(stage)
+	os.makedirs(staged_output)
+
+	for page_name in index["pages"]:
+		shutil.copy2( os.path.join( output, page_name ), staged_output )
+	with open( os.path.join( staged_output, ATLAS_INDEX ), "w" ) as fout:
+		json.dump( { key: value for key, value in index.items() if key != "sources" }, fout, indent = 1 )
+	count = len(index["pages"]) + 1
+
+	for current_path, subfolders, files in os.walk(graphics):
+		if os.path.abspath(current_path).startswith(output):
+			subfolders.clear()
+			continue
+
+		for file_name in files:
+			name = os.path.relpath( os.path.join( current_path, file_name ), graphics )
+			if name.replace( os.sep, "/" ) in index["frames"]: continue
+			os.makedirs( os.path.join( stage, os.path.dirname(name) ), exist_ok = True )
+			shutil.copy2( os.path.join( graphics, name ), os.path.join( stage, name ) )
+			count += 1
+	return count
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+# Shared by every image loader
+atlas = Atlas()
+
+
+if __name__ == '__main__':
+	# Command line only, kept out of the game startup imports
+	import argparse
+
+	parser = argparse.ArgumentParser(description = "Pack the graphics folder images into atlas pages and a JSON index")
+	parser.add_argument("--output", default = ATLAS_FOLDER, help = "atlas folder")
+	parser.add_argument("--page-size", type = int, default = ATLAS_PAGE_SIZE, help = "page width and height, in pixels")
+	parser.add_argument("--max-size", type = int, default = ATLAS_MAX_IMAGE_SIZE, help = "larger images are not packed")
+	parser.add_argument("--stage", default = None, help = "also copy the atlas and the unpacked images to this graphics folder (builds)")
+	args = parser.parse_args()
+
+	index = build_atlas( output = args.output, page_size = args.page_size, max_size = args.max_size )
+	print( "{} images packed in {} pages: {}".format( len(index["frames"]), len(index["pages"]), args.output ) )
+	if args.stage:
+		print( "{} files staged: {}".format( stage_graphics( index, args.stage, output = args.output ), args.stage ) )
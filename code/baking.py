@@ -0,0 +1,282 @@
+import os
+import numpy
+import pygame
+from code.map_format import TILE_EMPTY
+from code.settings import MAP_BAKE_WORKERS, TILE_SIZE
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def merge_cells(mask):
+	"""Cover the True cells of a 2D boolean grid with few rectangles, returns (col, row, width, height) tuples
+
+	Greedy merge: cells are scanned row by row, each free cell starts the widest run along its row, which then
+	grows downwards as long as the cells below the whole run are free too.
+	"""
+	free = mask.tolist()
+	height = len(free)
+	width = len(free[0]) if height else 0
+
+	rects = []
+	for row in range(height):
+		line = free[row]
+		col = 0
+		while col < width:
+			if not line[col]:
+				col += 1
+				continue
+
+			# Widest run starting at this cell
+			end = col
+			while end < width and line[end]: end += 1
+
+			# Grow downwards
+			bottom = row + 1
+			while bottom < height and all( free[bottom][col:end] ): bottom += 1
+
+			for covered in range(row, bottom):
+				free[covered][col:end] = [False] * (end - col)
+			rects.append( (col, row, end - col, bottom - row) )
+			col = end
+	return rects
+
+
+def bake_row_strips(mask, image, max_length):
+	"""Pre-render the True cells of a 2D boolean grid as horizontal strips of @image (at most @max_length cells each)
+
+	Returns [ (surface, world rect) ]. Every cell of a strip lies on the same row, so a strip is y-sorted like
+	the single tiles it replaces. Strips of the same length share their surface.
+	"""
+	surfaces = {} 	# length => pygame.Surface
+	strips = []
+
+	for row, line in enumerate( mask.tolist() ):
+		width = len(line)
+		col = 0
+		while col < width:
+			if not line[col]:
+				col += 1
+				continue
+
+			end = col
+			while end < width and end - col < max_length and line[end]: end += 1
+			length = end - col
+
+			# The image is centered on each cell, like a StaticSprite spawned at the cell center
+			first = image.get_rect( center = ( col * TILE_SIZE + TILE_SIZE // 2, row * TILE_SIZE + TILE_SIZE // 2 ) )
+			rect = first.union( first.move( (length - 1) * TILE_SIZE, 0 ) )
+
+			surface = surfaces.get(length)
+			if surface is None:
+				surface = surfaces[length] = pygame.Surface( rect.size, flags = pygame.SRCALPHA ).convert_alpha()
+				for index in range(length):
+					surface.blit( image, (index * TILE_SIZE, 0) )
+
+			strips.append( (surface, rect) )
+			col = end
+	return strips
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def display_pixel_format():
+	"""Byte order (pygame.image.tobytes/frombuffer format) of the display alpha surfaces, blitted without conversion"""
+	masks = pygame.Surface( (1, 1), flags = pygame.SRCALPHA ).convert_alpha().get_masks()
+	return "BGRA" if masks[0] == 0x00ff0000 else "RGBA"
+
+
+def compose_tiles(table, rows, out = None):
+	"""Pixels of a tile ids grid: @rows (2D array of table rows) picked from @table (tiles x size x size x 4)
+
+	Returns a contiguous (height, width, 4) uint8 array (@out when given), rows of tiles are laid out with a
+	single fancy indexing pass. Plain numpy, also run by the baking worker processes.
+	"""
+	count_y, count_x = rows.shape
+	size = table.shape[1]
+	pixels = numpy.empty( (count_y * size, count_x * size, 4), dtype = numpy.uint8 ) if out is None else out
+	pixels.reshape( (count_y, size, count_x, size, 4) )[...] = table[rows].transpose( (0, 2, 1, 3, 4) )
+	return pixels
+
+
+class TilesetPixels:
+	"""Pixel table of a tileset: one TILE_SIZE square per tile id (plus a transparent one for empty cells)
+
+	Each square holds the tile image as blitted on an empty alpha surface (clipped to the cell), with its debug
+	frame when @debug is set: baking a grid of cells is then a table lookup instead of a blit per cell.
+	"""
+
+	def __init__(self, tileset, debug = False, pixel_format = None):
+		self.pixel_format = pixel_format or display_pixel_format()
+
+		# Tile id => table row, shifted by the smallest id (TILE_EMPTY included). Unknown ids are empty
+		self.base = min( TILE_EMPTY, *tileset ) if tileset else TILE_EMPTY
+		top = max( TILE_EMPTY, *tileset ) if tileset else TILE_EMPTY
+		self.lookup = numpy.zeros( top - self.base + 1, dtype = numpy.intp )
+
+		self.table = numpy.zeros( (len(tileset) + 1, TILE_SIZE, TILE_SIZE, 4), dtype = numpy.uint8 )
+		for row, (tile_id, tile) in enumerate( tileset.items(), start = 1 ):
+			square = pygame.Surface( (TILE_SIZE, TILE_SIZE), flags = pygame.SRCALPHA ).convert_alpha()
+			square.blit( tile.image, (0, 0) )
+			if debug:
+				pygame.draw.rect( square, tile.debug_color, square.get_rect(), width = 1 )
+			self.table[row] = numpy.frombuffer(
+				pygame.image.tobytes( square, self.pixel_format ), dtype = numpy.uint8
+			).reshape( (TILE_SIZE, TILE_SIZE, 4) )
+			self.lookup[tile_id - self.base] = row
+
+	def rows(self, cells):
+		"""Table rows of a 2D array of tile ids"""
+		return self.lookup[ cells.astype(numpy.intp) - self.base ]
+
+	def surface(self, pixels):
+		"""Wrap composed @pixels in a surface, no copy (the surface keeps the array alive)"""
+		height, width = pixels.shape[:2]
+		return pygame.image.frombuffer( pixels, (width, height), self.pixel_format )
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def bake_workers():
+	"""Worker processes baking chunks off-frame (MAP_BAKE_WORKERS, None for one per extra core)"""
+	if MAP_BAKE_WORKERS is not None: return MAP_BAKE_WORKERS
+	return max( 0, (os.cpu_count() or 1) - 1 )
+
+
+# Worker processes: tileset pixels table of the pool (see ChunkBaker.start)
+_worker_table = None
+
+
+def _init_worker(table):
+	global _worker_table
+	_worker_table = table
+
+
+def _compose_shared(rows):
+	"""Worker process: compose @rows into a new shared memory block, returns (block name, pixels shape)"""
+	from multiprocessing.shared_memory import SharedMemory
+
+	size = _worker_table.shape[1]
+	shape = ( rows.shape[0] * size, rows.shape[1] * size, 4 )
+	block = SharedMemory( create = True, size = shape[0] * shape[1] * 4 )
+	compose_tiles( _worker_table, rows, numpy.ndarray( shape, dtype = numpy.uint8, buffer = block.buf ) )
+	block.close()
+	return block.name, shape
+
+
+def _release_block(future):
+	"""Unlink the shared memory block of a discarded job"""
+	if future.cancelled() or future.exception(): return
+	from multiprocessing.shared_memory import SharedMemory
+	block = SharedMemory( future.result()[0] )
+	block.close()
+	block.unlink()
+
+
+class BakeJob:
+	"""A chunk baked by a worker process, polled by the renderer until done"""
+
+	def __init__(self, pixels, rows, future):
+		self.pixels = pixels
+		self.rows 	= rows
+		self.future = future
+
+	def done(self):
+		return self.future.done()
+
+	def result(self):
+		"""Chunk surface (composed in the game process if the worker failed)"""
+		try:
+			name, shape = self.future.result()
+		except Exception:
+			return self.pixels.surface( compose_tiles( self.pixels.table, self.rows ) )
+
+		from multiprocessing.shared_memory import SharedMemory
+		block = SharedMemory(name)
+		# A single copy out of the block, which can then be released right away
+		pixels = numpy.ndarray( shape, dtype = numpy.uint8, buffer = block.buf ).copy()
+		block.close()
+		block.unlink()
+		return self.pixels.surface(pixels)
+
+	def discard(self):
+		"""The chunk is not needed anymore (evicted, map redrawn)"""
+		if not self.future.cancel(): self.future.add_done_callback(_release_block)
+
+
+class ChunkBaker:
+	"""Bake map cells into surfaces from a TilesetPixels table, in the game process or off-frame in a process pool
+
+	The pool (MAP_BAKE_WORKERS, one worker per extra core by default) receives the pixels table once, through its initializer: it is
+	restarted when the table changes (e.g. debug frames toggled). Workers write each chunk into a shared
+	memory block rather than sending it through a pipe. Until the pool is up, chunks are baked in process.
+	Workers come from a clean interpreter (forkserver or spawn), they never inherit the display or game threads.
+	"""
+
+	def __init__(self, workers = None):
+		self.workers 	= bake_workers() if workers is None else workers
+		self.executor 	= None
+		self.table 		= None 	# Pixels table sent to the workers
+		self.ready 		= None 	# Future done once a worker process runs
+
+	def start(self, table):
+		"""Start the worker processes in the background, for the @table pixels table"""
+		# Deferred imports, most launches never start the pool
+		import multiprocessing
+		from concurrent.futures import ProcessPoolExecutor
+
+		self.shutdown()
+		methods = multiprocessing.get_all_start_methods()
+		context = multiprocessing.get_context( "forkserver" if "forkserver" in methods else "spawn" )
+		self.executor 	= ProcessPoolExecutor(
+			max_workers = self.workers, mp_context = context, initializer = _init_worker, initargs = (table,)
+		)
+		self.table 		= table
+		self.ready 		= self.executor.submit( os.getpid )
+
+	def parallel(self, pixels):
+		"""Whether chunks of @pixels can be submitted to the pool right now (starting it if needed)"""
+		if self.workers <= 0: return False
+		if self.table is None or not numpy.array_equal( self.table, pixels.table ): self.start(pixels.table)
+		if not self.ready.done(): return False
+		if self.ready.exception():
+			# Broken pool, keep baking in the game process
+			self.shutdown()
+			self.workers = 0
+			return False
+		return True
+
+	def submit(self, pixels, cells):
+		"""Bake a 2D array of tile ids off-frame (see parallel), returns a BakeJob or None when every cell is empty"""
+		rows = pixels.rows(cells)
+		if not rows.any(): return None
+		return BakeJob( pixels, rows, self.executor.submit( _compose_shared, rows ) )
+
+	def bake(self, pixels, cells):
+		"""Surface of a 2D array of tile ids (@pixels: TilesetPixels), None when every cell is empty"""
+		return self.bake_many( pixels, [ cells ] )[0]
+
+	def bake_many(self, pixels, grids):
+		"""Surfaces of several 2D arrays of tile ids, in the same order (None for the empty ones), in process"""
+		surfaces = []
+		for cells in grids:
+			rows = pixels.rows(cells)
+			surfaces.append( pixels.surface( compose_tiles( pixels.table, rows ) ) if rows.any() else None )
+		return surfaces
+
+	def shutdown(self):
+		"""Stop the worker processes, if any"""
+		if self.executor:
+			self.executor.shutdown( wait = False, cancel_futures = True )
+			self.executor 	= None
+			self.table 		= None
+			self.ready 		= None
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+# Shared by every map renderer
+chunk_baker = ChunkBaker()
@@ -0,0 +1,58 @@
+from os.path import join
+from code.utils import import_folder
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class Clip:
+	"""Frames of an animation at one scale, with its playback speed and mode, shared by every sprite playing it"""
+
+	__slots__ = ( "frames", "speed", "loop" )
+
+	def __init__(self, frames, speed, loop = True):
+		self.frames = tuple(frames)
+		self.speed 	= speed 	# frames per second
+		self.loop 	= loop 		# Looping clips restart from their first frame, one-shot clips stop on their last one
+
+	@property
+	def length(self):
+		"""Duration of a single playback (seconds)"""
+		return len(self.frames) / self.speed if self.speed else 0.0
+
+	def frame(self, elapsed):
+		"""Frame shown @elapsed seconds after the clip started"""
+		index = int( elapsed * self.speed )
+		if self.loop: 	return self.frames[ index % len(self.frames) ]
+		else: 			return self.frames[ min( index, len(self.frames) - 1 ) ]
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class ClipRegistry:
+	"""Clips built once per (folder, animations, scale size, speed, mode), handed out as { animation: Clip } sets"""
+
+	def __init__(self):
+		self.sets = {} 	# key => { animation: Clip }
+
+	def get(self, folder, animations, scale_size, speed, loop = True):
+		"""Clip set of the @animations subfolders of @folder (frames loaded through the asset cache)"""
+		key = ( folder, tuple(animations), tuple(scale_size), speed, loop )
+		clips = self.sets.get(key)
+		if clips is None:
+			clips = self.sets[key] = {
+				animation: Clip( import_folder( join( folder, animation ), scale_size ), speed, loop ) for animation in animations
+			}
+		return clips
+
+	def clear(self):
+		"""Drop every clip (e.g. when the display mode changes, like the asset cache)"""
+		self.sets.clear()
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+# Shared by every animated sprite
+clip_registry = ClipRegistry()
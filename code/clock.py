@@ -0,0 +1,32 @@
+#
+# Game time, advanced once per frame by the GameManager. Systems derive time-based state from it
+# (e.g. the current frame of an animation, timers expiry) instead of accumulating their own deltas
+#
+
+
+class FrameClock:
+	"""Game time (seconds) of the current frame: real time multiplied by @scale, frozen while @paused"""
+
+	def __init__(self):
+		self.time 	= 0.0 	# seconds
+		self.delta 	= 0.0 	# Game time elapsed during the last frame (seconds)
+		self.scale 	= 1.0 	# Game seconds per real second
+		self.paused = False
+
+	@property
+	def ticks(self):
+		"""Game time in milliseconds, the timers resolution (see code.timer)"""
+		return int( self.time * 1000.0 )
+
+	def advance(self, dt):
+		"""Start a new frame, @dt real seconds after the previous one, returns the game time elapsed"""
+		self.delta = 0.0 if self.paused else dt * self.scale
+		self.time += self.delta
+		return self.delta
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+# Shared by every system
+frame_clock = FrameClock()
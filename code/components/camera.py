@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pygame import Rect
 from code.settings import VIEWPORT_WIDTH, VIEWPORT_HEIGHT
 
@@ -6,13 +6,14 @@ from code.settings import VIEWPORT_WIDTH, VIEWPORT_HEIGHT
 # -------------------------------------------------------------------------------------------------
 
 
-@dataclass( kw_only = True )
+@dataclass( kw_only = True, slots = True )
 class CameraFollow:
 	"""Viewport camera attached to a game object"""
 
 	target: object 						# An object with a rect property (pygame.Rect)
 	width: 	int 	= VIEWPORT_WIDTH
 	height: int 	= VIEWPORT_HEIGHT
+	rect: 	Rect 	= field( init = False )
 
 	def __post_init__(self):
 		self.rect = Rect( 0, 0, self.width, self.height )
@@ -10,17 +10,7 @@ from code.settings import (
 # -------------------------------------------------------------------------------------------------
 
 
-"""
-	TODO FIXME
-
-	The animation timers work well on 60 fps but need to scale when using lower values.
-	On fps < 60 the animations cannot complete a full cycle
-
-		e.g. on 10 fps the animation starts and ends with only one frame rendered
-		e.g. on 30 fps the animation starts and ends with half the needed frames rendered
-"""
-
-@dataclass
+@dataclass( slots = True )
 class PlayerController:
 	"""Handle player animations length and abilities cooldown"""
 
@@ -45,9 +35,3 @@ class PlayerController:
 			if timer.active:
 				return True
 		return False
-
-	def update(self):
-		for key in self.timers:
-			self.timers[key].update()
-		for key in self.cooldowns:
-			self.cooldowns[key].update()
@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+@dataclass( slots = True )
+class PooledEffect:
+	"""Marks an entity owned by an EffectPool: it gets recycled instead of deleted once its animation completes"""
+
+	pool: 	object 	# Owner EffectPool
+	size: 	int 	# Scale bucket the entity frames belong to
@@ -8,6 +8,8 @@ from code.settings import HITBOX_DEBUG_COLOR, TILE_SIZE
 class Hitbox:
 	"""Rectangle used for collision detection"""
 
+	__slots__ = ( "offset_x", "offset_y", "scale_factor_x", "scale_factor_y", "debug_color", "reference_rect", "rect" )
+
 	def __init__(
 		self,
 		*,
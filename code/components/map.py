@@ -1,7 +1,16 @@
-from os.path import join
+import numpy
+from os.path import exists
 from code.components.sprite import StaticSprite
+from code.map_format import (
+	TILE_EMPTY,
+	binary_map_path,
+	read_binary_map,
+	read_text_layer,
+	text_layer_path
+)
 from code.settings import (
 	MAP_TILE_DEBUG_COLOR,
+	MAPS_FOLDER,
 	RENDERING_LAYERS,
 	SPRITE_FLOOR,
 	TILE_SIZE
@@ -14,6 +23,8 @@ from code.settings import (
 class Tile(StaticSprite):
 	"""A map tile, basically a simple sprite with flags"""
 
+	__slots__ = ( "walkable", )
+
 	def __init__(
 		self,
 		*,
@@ -38,52 +49,147 @@ class Tile(StaticSprite):
 # -------------------------------------------------------------------------------------------------
 
 
+def read_level(file_name, layers, folder=MAPS_FOLDER):
+	"""Read the @layers of level @file_name as { layer name: int16 array }, no pygame calls (safe on worker threads)"""
+	level_data = {}
+
+	# Prefer the binary level (memory-mapped), fall back to one text file per layer
+	binary_path = binary_map_path( file_name, folder )
+	if exists(binary_path):
+		_, __, binary_layers = read_binary_map(binary_path)
+		for layer in layers:
+			level_data[layer] = binary_layers[layer]
+	else:
+		for layer in layers:
+			level_data[layer] = read_text_layer( text_layer_path(file_name, layer, folder) )
+
+	return level_data
+
+
+# -------------------------------------------------------------------------------------------------
+
+
 class TileMap:
-	"""Manage the current level map of tiles (each rendering layer has its own map)"""
+	"""Manage the current level map of tiles (each rendering layer has its own map of int16 tile ids)"""
 
-	def __init__(self, file_name, layers, tileset):
+	def __init__(self, file_name, layers, tileset, folder=MAPS_FOLDER, level_data=None):
 		self.file_name 	= file_name
 		self.layers 	= layers
-		self.tileset 	= tileset
+		self.tileset 	= tileset 	# tile id (int) => Tile
+		self.folder 	= folder
+
+		# Layer name => (rows x columns) int16 array, TILE_EMPTY for empty cells
+		self.level_data 	= {}
 
 		self.map_width 		= 0
 		self.map_height 	= 0
 		self.world_width 	= 0
 		self.world_height 	= 0
 
+		# Walkable cells, all layers combined (rows x columns boolean array)
+		self.walkable 		= numpy.zeros( (0, 0), dtype=bool )
+		# Summed area table of unwalkable cells, built on demand for batched rect queries
+		self._blocked_sat 	= None
+
 		# Setup map data
-		self.load(self.file_name, self.layers)
+		self.load(self.file_name, self.layers, level_data)
 
-	def load(self, file_name, layers):
-		"""Load level data from disk"""
+	def load(self, file_name, layers, level_data=None):
+		"""Load level data from disk, unless it has already been read (@level_data, see read_level)"""
 		# No source specified
 		if not file_name or not layers: return
 
-		# Reset current level
-		self.level_data = {}
-
 		# Update map metadata
 		if file_name != self.file_name:
 			self.file_name = file_name
 		if layers != self.layers:
 			self.layers = layers
 
-		# Load level layer by layer
-		last_layer = ""
-		for layer in layers:
-			last_layer = layer
-			self.level_data[layer] = []
-			# Build the current layer path
-			full_path = join( "data", "maps", "{}_{}.txt".format(file_name, layer) )
-			# Read map layer data
-			with open( full_path, "r" ) as fin:
-				data = None
-				while line := fin.readline():
-					data = line.split(" ")
-					data[-1] = data[-1].replace("\n", "") # Remove newline from last element
-					self.level_data[layer].append(data)
+		# Replace current level
+		self.level_data = level_data or read_level( file_name, layers, self.folder )
+
 		# Get map dimensions
-		self.map_height 	= len(self.level_data[last_layer])
-		self.map_width 		= len(self.level_data[last_layer][0])
+		self.map_height, self.map_width = self.level_data[layers[-1]].shape
 		self.world_height 	= self.map_height * TILE_SIZE
 		self.world_width 	= self.map_width * TILE_SIZE
+
+		# Precompute collision data
+		self.build_walkability()
+
+	def cell_walkable(self, x, y):
+		"""Combine all layers for the (@x, @y) cell: at least one tile and no unwalkable tiles"""
+		empty_cells_layer = 0
+		for layer in self.layers:
+			cell_value = int( self.level_data[layer][y, x] )
+			# Skip empty cells in the current layer
+			if cell_value == TILE_EMPTY:
+				empty_cells_layer += 1
+				continue
+			# Check if the current cell cannot be walked on
+			if not self.tileset[cell_value].walkable:
+				return False
+		# If all layers have an empty cell in (x, y) then we can't walk on that tile
+		return empty_cells_layer != len(self.layers)
+
+	def build_walkability(self):
+		"""Fold all layers and tileset walkable flags into the walkability grid"""
+		shape = (self.map_height, self.map_width)
+		walkable = numpy.ones( shape, dtype=bool )
+		empty = numpy.ones( shape, dtype=bool )
+
+		for layer in self.layers:
+			cells = self.level_data[layer]
+			empty &= cells == TILE_EMPTY
+			# Mask out every cell holding an unwalkable tile
+			for tile_id, tile in self.tileset.items():
+				if not tile.walkable:
+					walkable &= cells != tile_id
+
+		self.walkable = walkable & ~empty
+		self._blocked_sat = None
+
+	def set_tile(self, layer, x, y, value):
+		"""Change the (@x, @y) cell of @layer to the @value tile id (TILE_EMPTY for empty) and update collision data"""
+		self.level_data[layer][y, x] = value
+		self.walkable[y, x] = self.cell_walkable(x, y)
+		self._blocked_sat = None
+
+	def is_walkable_rect(self, rect):
+		"""Check that every cell overlapped by @rect (world coordinates) is walkable"""
+		# Overlapped cells, clamped to map boundaries
+		min_x = max( 0, rect.left // TILE_SIZE )
+		min_y = max( 0, rect.top // TILE_SIZE )
+		max_x = min( self.map_width - 1, (rect.right - 1) // TILE_SIZE )
+		max_y = min( self.map_height - 1, (rect.bottom - 1) // TILE_SIZE )
+		if max_x < min_x or max_y < min_y: return False
+
+		# Single cell, skip slicing
+		if min_x == max_x and min_y == max_y:
+			return bool( self.walkable[min_y, min_x] )
+
+		return bool( self.walkable[min_y:max_y + 1, min_x:max_x + 1].all() )
+
+	def walkable_rects(self, left, top, right, bottom):
+		"""Vectorized is_walkable_rect: one boolean per rect, given numpy arrays of rect edges (world coordinates)"""
+		# Summed area table: blocked cells count in [0, y) x [0, x) is stored at (y, x)
+		if self._blocked_sat is None:
+			sat = numpy.zeros( (self.map_height + 1, self.map_width + 1), dtype=numpy.int32 )
+			sat[1:, 1:] = (~self.walkable).cumsum(axis=0, dtype=numpy.int32).cumsum(axis=1, dtype=numpy.int32)
+			self._blocked_sat = sat
+
+		# Overlapped cells, clamped to map boundaries
+		min_x = numpy.maximum( 0, left // TILE_SIZE ).astype(numpy.intp)
+		min_y = numpy.maximum( 0, top // TILE_SIZE ).astype(numpy.intp)
+		max_x = numpy.minimum( self.map_width - 1, (right - 1) // TILE_SIZE ).astype(numpy.intp)
+		max_y = numpy.minimum( self.map_height - 1, (bottom - 1) // TILE_SIZE ).astype(numpy.intp)
+		valid = (max_x >= min_x) & (max_y >= min_y)
+
+		# Count blocked cells inside each rect with four table reads
+		sat = self._blocked_sat
+		min_x = numpy.minimum( min_x, self.map_width - 1 )
+		min_y = numpy.minimum( min_y, self.map_height - 1 )
+		max_x = numpy.clip( max_x, min_x, self.map_width - 1 ) + 1
+		max_y = numpy.clip( max_y, min_y, self.map_height - 1 ) + 1
+		blocked = sat[max_y, max_x] - sat[min_y, max_x] - sat[max_y, min_x] + sat[min_y, min_x]
+
+		return valid & (blocked == 0)
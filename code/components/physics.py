@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pygame.math import Vector2
 from code.settings import (
 	ACCELERATION_BASE_FLOOR,
@@ -12,7 +12,7 @@ from code.settings import (
 # -------------------------------------------------------------------------------------------------
 
 
-@dataclass( kw_only = True )
+@dataclass( kw_only = True, slots = True )
 class PhysicsBody:
 	"""Manage object movement in the physics simulation"""
 
@@ -20,9 +20,15 @@ class PhysicsBody:
 	_speed_factor:	float = SPEED_BASE_FACTOR
 	friction:		float = FRICTION_BASE_FLOOR
 	acceleration:	float = ACCELERATION_BASE_FLOOR
-	direction:		Vector2 = Vector2(0, 0)
-	position: 		Vector2 = Vector2(0, 0)
-	velocity: 		Vector2 = Vector2(0, 0)
+	direction:		Vector2 = field( default_factory = Vector2 )
+	position: 		Vector2 = field( default_factory = Vector2 )
+	velocity: 		Vector2 = field( default_factory = Vector2 )
+	# Position before the last simulation step, used to interpolate render positions
+	previous_position: Vector2 = None
+
+	def __post_init__(self):
+		if self.previous_position is None:
+			self.previous_position = Vector2(self.position)
 
 	@property
 	def speed(self):
@@ -1,6 +1,6 @@
-from os.path import join
-from code.timer import Timer
-from code.utils import import_folder, load_image, load_scaled_image
+from code.clips import Clip, clip_registry
+from code.clock import frame_clock
+from code.utils import load_image, load_scaled_image
 from code.settings import (
 	ANIMATED_SPRITE_DEBUG_COLOR,
 	RENDERING_LAYERS,
@@ -15,10 +15,13 @@ from code.settings import (
 class StaticSprite:
 	"""A simple sprite"""
 
+	__slots__ = ( "file_name", "layer", "scale_size", "spawn_point", "debug_color", "image", "rect" )
+
 	def __init__(
 		self,
 		*,
 		file_name 	= SPRITE_UNKNOWN,
+		image 		= None, 	# Prebuilt surface (e.g. baked geometry), file_name and scale_size are ignored
 		layer 		= RENDERING_LAYERS["main"],
 		scale_size 	= (),
 		spawn_point = (-1024, -1024),
@@ -30,8 +33,10 @@ class StaticSprite:
 		self.spawn_point 	= spawn_point
 		self.debug_color 	= debug_color
 
-		# Load image surface from disk
-		if not scale_size:
+		# Load image surface (shared through the asset cache)
+		if image:
+			self.image = image
+		elif not scale_size:
 			self.image = load_image( file_name )
 		else:
 			self.image = load_scaled_image( file_name, scale_size )
@@ -42,7 +47,17 @@ class StaticSprite:
 
 
 class AnimatedSprite:
-	"""A sprite with animation support"""
+	"""A sprite with animation support
+
+	Stateless playback: the sprite only holds a shared clip set (see code.clips), its status and its start time,
+	the current frame is derived from the frame clock when the image is read (i.e. when the sprite is drawn).
+	@frames_table lists the animations (subfolders of @folder), or holds prebuilt frames when there is no folder.
+	"""
+
+	__slots__ = (
+		"duration", "folder", "clips", "layer", "scale_size", "spawn_point", "speed", "loop", "debug_color",
+		"status", "started", "rect"
+	)
 
 	def __init__(
 		self,
@@ -54,67 +69,72 @@ class AnimatedSprite:
 		scale_size 		= (),
 		spawn_point 	= (-1024, -1024),
 		speed 			= 6,
+		loop 			= True,
 		debug_color 	= ANIMATED_SPRITE_DEBUG_COLOR,
 	):
-		self.duration 		= duration
+		self.duration 		= duration 	# milliseconds, 0 to play until removed (or until a one-shot clip ends)
 		self.folder 		= folder
-		self.frames_table 	= frames_table
 		self.layer 			= layer
 		self.scale_size 	= scale_size
 		self.spawn_point 	= spawn_point
 		self.speed 			= speed
+		self.loop 			= loop
 		self.debug_color 	= debug_color
 
+		# Prebuilt frames (not shared through the registry)
+		self.clips = { animation: Clip( frames, speed, loop ) for animation, frames in frames_table.items() if frames }
+
 		# Animation controls
-		self.status 			= ""
-		self.frame_index 		= 0
-		self.frames_table_keys 	= list(self.frames_table.keys())
-		self.timer 				= Timer( self.duration )
+		self.status 	= next( iter(frames_table), "" )
+		self.started 	= frame_clock.time
+		self.rect 		= None
 
 		# Setup images
-		self.load( folder )
+		self.load( folder, frames_table )
+
+	@property
+	def elapsed(self):
+		"""Seconds since the animation started"""
+		return frame_clock.time - self.started
 
 	@property
 	def completed(self):
-		return self.duration and not self.timer.active
+		if self.duration: return self.elapsed * 1000.0 >= self.duration
+		clip = self.clips[self.status]
+		return not clip.loop and self.elapsed >= clip.length
 
-	def load(self, folder):
-		"""Load all image surfaces from the given folder"""
-		# No source specified
-		if not folder: return
+	@property
+	def image(self):
+		"""Current frame"""
+		return self.clips[self.status].frame( frame_clock.time - self.started )
+
+	def play(self, status):
+		"""Switch to animation @status, from its first frame (assigning status instead keeps the playback time)"""
+		self.status = status
+		self.started = frame_clock.time
+
+	def load(self, folder, animations = None):
+		"""Use the shared clips of the @animations subfolders of @folder (defaults to the current animations)"""
+		# No source specified, prebuilt frames (if any) only need their rect
+		if not folder:
+			if self.clips: self.rect = self.image.get_rect( center = self.spawn_point )
+			return
 
 		# Update sources directory
 		if folder != self.folder:
 			self.folder = folder
 
-		# Load animation surfaces from folder images
-		for animation in self.frames_table_keys:
-			self.frames_table[animation] = import_folder( join( folder, animation ), self.scale_size )
+		self.clips = clip_registry.get( folder, animations or self.clips, self.scale_size, self.speed, self.loop )
 
-		# Reset controls
-		self.frame_index = 0
-		self.status = self.frames_table_keys[0]
+		self.reset( self.spawn_point )
 
-		# Assign current animation frame
-		self.image = self.frames_table[self.status][self.frame_index]
-		self.rect = self.image.get_rect( center = self.spawn_point )
-
-		# Start animation
-		if self.duration: self.timer.activate()
-
-	def update(self, dt):
-		"""Update animation index with the current deltatime to be framerate-independent"""
-		if self.duration and self.completed: return
-
-		self.frame_index += self.speed * dt
+	def reset(self, spawn_point):
+		"""Restart the animation from its first frame, centered at @spawn_point (frames must be loaded)"""
+		self.spawn_point = spawn_point
 
-		# Clamp frame index to obtain a circular animation
-		if self.frame_index >= len(self.frames_table[self.status]):
-			self.frame_index = 0
-
-		# Update current animation frame
-		old_rect = self.rect
-		self.image = self.frames_table[self.status][int(self.frame_index)]
-		self.rect = self.image.get_rect( center = old_rect.center )
+		# Reset controls
+		self.status = next( iter(self.clips) )
+		self.started = frame_clock.time
 
-		if self.duration: self.timer.update()
+		# Frames of a clip share their size, the rect only follows the sprite position
+		self.rect = self.image.get_rect( center = self.spawn_point )
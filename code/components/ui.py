@@ -1,7 +1,7 @@
 import pygame
 
 from typing import Callable
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from code.utils import load_scaled_image
 
@@ -9,7 +9,7 @@ from code.utils import load_scaled_image
 # -------------------------------------------------------------------------------------------------
 
 
-@dataclass
+@dataclass( slots = True )
 class UiButton:
 	"""Button background (color or image) with hovering support"""
 	file_name: str = None
@@ -29,11 +29,13 @@ class UiButton:
 # -------------------------------------------------------------------------------------------------
 
 
-@dataclass
+@dataclass( slots = True )
 class UiCursor:
 	"""Mouse cursor"""
 	file_name: str = "unknown.png"
 	size: tuple = (48, 48)
+	image: pygame.Surface = field( init = False )
+	rect: pygame.Rect = field( init = False )
 
 	def __post_init__(self):
 		self.image = load_scaled_image(self.file_name, self.size)
@@ -43,11 +45,13 @@ class UiCursor:
 # -------------------------------------------------------------------------------------------------
 
 
-@dataclass
+@dataclass( slots = True )
 class UiImage:
 	"""Image loaded from disk"""
 	file_name: str = "unknown.png"
 	size: tuple = (64, 64)
+	image: pygame.Surface = field( init = False )
+	rect: pygame.Rect = field( init = False )
 
 	def __post_init__(self):
 		self.image = load_scaled_image(self.file_name, self.size)
@@ -57,7 +61,7 @@ class UiImage:
 # -------------------------------------------------------------------------------------------------
 
 
-@dataclass
+@dataclass( slots = True )
 class UiItem:
 	"""Logical item with an action"""
 	rect: pygame.Rect
@@ -67,11 +71,25 @@ class UiItem:
 # -------------------------------------------------------------------------------------------------
 
 
-@dataclass
+@dataclass( slots = True )
+class UiProgress:
+	"""Progress bar, @value goes from 0 to 1"""
+	rect: pygame.Rect
+	color: tuple = (0, 0, 0)
+	background_color: tuple = (255, 255, 255)
+	value: float = 0.0
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+@dataclass( slots = True )
 class UiSurface:
 	"""Basic monochrome pygame.Surface"""
 	color: tuple = (255, 255, 255)
 	size: tuple = (64, 64)
+	image: pygame.Surface = field( init = False )
+	rect: pygame.Rect = field( init = False )
 
 	def __post_init__(self):
 		self.image = pygame.Surface(self.size)
@@ -82,7 +100,7 @@ class UiSurface:
 # -------------------------------------------------------------------------------------------------
 
 
-@dataclass
+@dataclass( slots = True )
 class UiText:
 	"""Ui text container"""
 	text: str = ""
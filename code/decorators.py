@@ -2,7 +2,7 @@ import time
 from functools import wraps
 from contextlib import contextmanager
 
-from code.settings import PROFILING_FILE
+from code.profiler import profiler
 
 
 # -------------------------------------------------------------------------------------------------
@@ -11,19 +11,34 @@ from code.settings import PROFILING_FILE
 def exectime(routine):
 	"""Simple execution time profiling for @routine function, keeps the return value untouched"""
 
+	# Samples are stored in memory (see code.profiler), the zone name is the routine qualified name
+	zone = routine.__qualname__
+
 	@wraps(routine)
 	def wrapper(*args, **kwargs):
+		# Profiling disabled, no overhead besides the flag check
+		if not profiler.enabled:
+			return routine(*args, **kwargs)
 		# Calculate time between routine start and end of execution
 		start = time.perf_counter()
 		ret = routine(*args, **kwargs)
-		end = time.perf_counter()
-		# Build data string
-		data = "EXECTIME: {}.{} => {} seconds".format(routine.__module__, routine.__qualname__, end - start)
-		# Write results to a file
-		if PROFILING_FILE and PROFILING_FILE != "":
-			print(data, file=PROFILING_FILE)
-		else:
-			print(data)
+		profiler.record( zone, (time.perf_counter() - start) * 1000.0 )
 		return ret
 
 	return wrapper
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+@contextmanager
+def profile_zone(zone):
+	"""Execution time profiling for a block of code"""
+	if not profiler.enabled:
+		yield
+		return
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		profiler.record( zone, (time.perf_counter() - start) * 1000.0 )
@@ -0,0 +1,64 @@
+import pygame
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class DisplayRegions:
+	"""Screen areas changed during the current frame, handed to pygame.display.update
+
+	Renderers that track their changes report them with add(), everything else is covered by a full update:
+	a frame without any report (or with an invalidate() call) refreshes the whole display.
+	"""
+
+	def __init__(self):
+		self.rects 		= [] 	# Changed screen areas
+		self.reported 	= False # Some renderer tracked its changes this frame
+		self.full 		= False # The whole screen changed
+
+	def add(self, rects):
+		"""Mark @rects (screen coordinates) as changed, an empty list means that nothing changed"""
+		self.reported = True
+		self.rects.extend(rects)
+
+	def invalidate(self):
+		"""Mark the whole screen as changed"""
+		self.full = True
+
+	def flush(self):
+		"""Changed areas of the frame (None when the whole screen has to be updated), then start a new frame"""
+		rects = self.rects if self.reported and not self.full else None
+		self.rects 		= []
+		self.reported 	= False
+		self.full 		= False
+		return rects
+
+	def update(self):
+		"""Push the changed areas of the frame to the display"""
+		rects = self.flush()
+		if rects is None: 	pygame.display.update()
+		elif rects: 		pygame.display.update(rects)
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def merge_rects(rects):
+	"""Union overlapping rects, a few larger rects are cheaper to redraw and push than many small ones"""
+	merged = []
+	for rect in rects:
+		rect = pygame.Rect(rect)
+		# Grow the rect until it does not overlap anything else
+		index = rect.collidelist(merged)
+		while index != -1:
+			rect.union_ip( merged.pop(index) )
+			index = rect.collidelist(merged)
+		merged.append(rect)
+	return merged
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+# Shared by every renderer
+display_regions = DisplayRegions()
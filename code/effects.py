@@ -0,0 +1,113 @@
+from code.clips import clip_registry
+from code.components.effect import PooledEffect
+from code.components.sprite import AnimatedSprite
+from code.profiler import profiler
+from code.settings import (
+	EFFECT_POOL_CEILING,
+	EFFECT_SCALE_BUCKETS,
+	RENDERING_LAYERS
+)
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class EffectPool:
+	"""Recycled one-shot animated effects (e.g. explosions), with frames prebuilt for a few scale buckets
+
+	Finished effects keep their entity and sprite: the AnimatedSprite component is detached and parked
+	until the next spawn with the same scale bucket, so spawning does not allocate entities or load frames.
+	"""
+
+	def __init__(
+		self,
+		*,
+		folder,
+		frames_table,
+		duration,
+		speed,
+		layer 		= RENDERING_LAYERS["main"],
+		min_size 	= 48,
+		max_size 	= 256,
+		buckets 	= EFFECT_SCALE_BUCKETS,
+		ceiling 	= EFFECT_POOL_CEILING
+	):
+		self.folder 	= folder
+		self.frames_table = frames_table 	# Animations (subfolders of @folder)
+		self.duration 	= duration
+		self.speed 		= speed
+		self.layer 		= layer
+		self.ceiling 	= ceiling 	# Maximum number of entities owned by the pool
+
+		# Quantised sizes, evenly spaced between @min_size and @max_size
+		step = (max_size - min_size) / max(1, buckets - 1)
+		self.sizes = sorted({ round(min_size + step * index) for index in range(buckets) })
+
+		# Size => scale size, the clips of each size are loaded once and shared by every effect of that size
+		self.scales = { size: (size, size) for size in self.sizes }
+		for size in self.sizes:
+			clip_registry.get( folder, frames_table, self.scales[size], speed )
+
+		# Size => [ (entity, sprite) ] parked effects, ready to be spawned again
+		self.parked = { size: [] for size in self.sizes }
+		self.entities = 0 	# Entities owned by the pool, live or parked
+
+		# Stats
+		self.hits 		= 0 	# Spawns served by a parked effect
+		self.misses 	= 0 	# Spawns that needed a new entity
+		self.overflows 	= 0 	# Spawns dropped because the pool reached its ceiling
+
+	@property
+	def stats(self):
+		parked = sum( len(items) for items in self.parked.values() )
+		return {
+			"entities": 	self.entities,
+			"live": 		self.entities - parked,
+			"parked": 		parked,
+			"hits": 		self.hits,
+			"misses": 		self.misses,
+			"overflows": 	self.overflows
+		}
+
+	def bucket(self, size):
+		"""Closest prebuilt size for @size"""
+		return min( self.sizes, key = lambda bucket: abs(bucket - size) )
+
+	def spawn(self, world, position, size):
+		"""Start an effect of roughly @size pixels centered at @position, returns its entity (None on overflow)"""
+		size = self.bucket(size)
+
+		# Reuse a parked effect
+		if self.parked[size]:
+			entity, sprite = self.parked[size].pop()
+			sprite.reset( position )
+			world.add_component( entity, sprite )
+			self.hits += 1
+			profiler.count("effects.pool_hits")
+			return entity
+
+		# Every pooled entity is alive, drop this effect
+		if self.entities >= self.ceiling:
+			self.overflows += 1
+			profiler.count("effects.pool_overflows")
+			return None
+
+		# Grow the pool
+		sprite = AnimatedSprite(	duration = self.duration,
+									folder = self.folder,
+									frames_table = self.frames_table,
+									layer = self.layer,
+									scale_size = self.scales[size],
+									speed = self.speed )
+		sprite.reset( position )
+		entity = world.create_entity( sprite, PooledEffect( pool = self, size = size ) )
+		self.entities += 1
+		self.misses += 1
+		profiler.count("effects.pool_misses")
+		return entity
+
+	def release(self, world, entity):
+		"""Park a completed effect, its entity stays alive without an AnimatedSprite (not rendered nor updated)"""
+		effect = world.component_for_entity( entity, PooledEffect )
+		sprite = world.remove_component( entity, AnimatedSprite )
+		self.parked[effect.size].append( (entity, sprite) )
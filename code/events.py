@@ -0,0 +1,75 @@
+import weakref
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class EventBus:
+	"""Named events delivered to subscribed handlers, queued (post) and delivered once per frame (flush)
+
+	A weak bus only holds weak references to bound methods, so handlers die with their instance. Child buses
+	(e.g. the bus of each loaded world) receive every event delivered by their parent until detached.
+	"""
+
+	def __init__(self, weak = False):
+		self.weak 		= weak
+		self.handlers 	= {} 	# event name => [ handler or weakref.WeakMethod ]
+		self.children 	= [] 	# Attached buses
+		self.queue 		= [] 	# (event name, args) posted since the last flush
+
+	def subscribe(self, name, handler):
+		if self.weak and hasattr(handler, "__self__"): handler = weakref.WeakMethod(handler)
+		self.handlers.setdefault( name, [] ).append(handler)
+
+	def unsubscribe(self, name, handler):
+		handlers = self.handlers.get( name, [] )
+		for item in list(handlers):
+			if item == handler or ( isinstance(item, weakref.WeakMethod) and item() == handler ):
+				handlers.remove(item)
+
+	def attach(self, bus):
+		if bus not in self.children: self.children.append(bus)
+
+	def detach(self, bus):
+		if bus in self.children: self.children.remove(bus)
+
+	def clear(self):
+		"""Drop every handler, child bus and pending event (e.g. when the owner is torn down)"""
+		self.handlers.clear()
+		self.children.clear()
+		self.queue.clear()
+
+	def post(self, name, *args):
+		"""Queue an event until the next flush"""
+		self.queue.append( (name, args) )
+
+	def flush(self):
+		"""Deliver the events posted since the last flush, events posted meanwhile wait for the next one"""
+		queue, self.queue = self.queue, []
+		for name, args in queue:
+			self.dispatch(name, *args)
+
+		for child in list(self.children):
+			child.flush()
+
+	def dispatch(self, name, *args):
+		"""Deliver an event right away, to this bus handlers then to the child buses"""
+		handlers = self.handlers.get(name)
+		if handlers:
+			for item in list(handlers):
+				handler = item() if isinstance(item, weakref.WeakMethod) else item
+				# Dead instance
+				if handler is None:
+					handlers.remove(item)
+					continue
+				handler(*args)
+
+		for child in list(self.children):
+			child.dispatch(name, *args)
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+# Game-wide events (managers, debug toggles), world buses are attached to it while their world is loaded
+event_bus = EventBus( weak = True )
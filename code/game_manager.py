@@ -1,7 +1,18 @@
+import sys
 import time
-import esper
 import pygame
 from code.settings import *
+from code.assets import surface_cache
+from code.atlas import atlas
+from code.clips import clip_registry
+from code.baking import chunk_baker
+from code.clock import frame_clock
+from code.timer import timer_wheel
+from code.decorators import profile_zone
+from code.input import input_state
+from code.display import display_regions
+from code.events import event_bus
+from code.profiler import ProfilerOverlay, profiler
 from code.world_manager import WorldManager
 
 # -------------------------------------------------------------------------------------------------
@@ -10,66 +21,69 @@ from code.world_manager import WorldManager
 class GameManager():
 	"""General program manager"""
 
-	def __init__(self):
+	def __init__(self, started=None, session=None):
+		# Launch time (time.perf_counter), defaults to now: time to first frame is measured from here
+		self.started 		= time.perf_counter() if started is None else started
+		self.first_frame 	= None 	# Time to first frame (seconds)
+		# Input recorder or player (see code.replay), None for live input only
+		self.session 		= session
+
 		# Setup pygame
-		pygame.init()
+		self.init_pygame()
 
 		self.screen 		= None	# Main window surface
 		self.clock 			= None 	# FPS limiter
 		self.world 			= None	# WorldManager instance
+		self.overlay 		= None 	# Profiler stats (debug)
 
 		self.running 		= False	# Game loop state
 		self.debug 			= False # Manager debug state
 		self.collisions 	= True 	# Collision detection
 
 		self.target_fps 	= FPS_LIMIT
-		self.fixed_dt 		= FIXED_DELTA_TIME
 		self.screen_flags 	= SCREEN_MODE_FLAGS
+		self.last_frame 	= time.perf_counter() 	# Previous frame start, real frame time source
 
 		# Register event handlers
-		esper.set_handler("quit_to_desktop", self.on_game_quit)
+		event_bus.subscribe("quit_to_desktop", self.on_game_quit)
+		event_bus.subscribe("scene_change", self.on_scene_change)
 
 		# Setup manager instance
 		self.reset()
 
+	def init_pygame(self):
+		"""Initialize the pygame subsystems in use only, pygame.init() would also start audio and joysticks
+
+		The SDL timer is started by pygame.time.Clock on its first tick, game time comes from code.clock.
+		"""
+		pygame.display.init()
+		pygame.font.init()
+
 	def on_game_quit(self):
 		"""Clean exit"""
 		self.world.quit()
 		self.running = False
-		if not PROFILING_FILE.closed:
-			PROFILING_FILE.close()
-		time.sleep(0.5)
-
-	def show_splash_screen(self):
-		"""Quick and dirty splash screen"""
-
-		# A warm, welcoming message
-		message = "Pippo Baudo non esiste"
-		font = pygame.font.SysFont(None, 64)
-		font_size = font.size(message)
-
-		# Centered text coords
-		size = self.screen.get_size()
-		center_x = size[0]/2 - font_size[0]/2
-		center_y = size[1]/2 - font_size[1]/2
-
-		# A greenish background
-		background = pygame.Surface(size)
-		background.fill((218, 253, 175))
-		self.screen.blit(background, (0, 0))
+		profiler.shutdown()
+		chunk_baker.shutdown()
 
-		# A black text
-		text_surface = font.render(message, True, (0, 0, 0))
-		self.screen.blit(text_surface, (center_x, center_y))
-
-		# Show changes
-		pygame.display.update()
+	def on_scene_change(self, name):
+		"""The new scene places its cursor at the current mouse position, not at the last motion event one"""
+		input_state.mouse_sync = True
 
 	def reset(self):
 		"""Instance setup"""
 
-		# Close active windows
-		pygame.display.quit()
+		# Tear down the previous scenes (event handlers included)
+		if self.world: self.world.quit()
+
+		# Close active windows (a new display mode is set right after)
+		if self.screen: pygame.display.quit()
+		# Cached surfaces were converted for the old display
+		surface_cache.clear()
+		atlas.reset()
+		clip_registry.clear()
+		# Timers of the previous scenes
+		timer_wheel.clear()
 
 		# Reset current instance
 		self.screen = pygame.display.set_mode( (SCREEN_WIDTH, SCREEN_HEIGHT), self.screen_flags )
@@ -78,17 +92,21 @@ class GameManager():
 		#pygame.event.set_allowed( [ pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP ] )
 		self.clock = pygame.time.Clock()
 
-		# Give the user some food for thought
-		self.show_splash_screen()
+		# Initialize the game scenes (loaded in the background, the loading world gives the user some food for thought)
+		self.world = WorldManager( loading_gate = self.session.loading_gate if self.session else None )
 
-		# Initialize the game scenes
-		self.world = WorldManager()
+		# Debug stats, drawn over every scene
+		self.overlay = ProfilerOverlay(profiler)
+		self.overlay.visible = self.debug
 
 		# Start game loop
 		self.running = True
 
-	def handle_events(self, events):
-		"""Manage pygame events queue"""
+	def handle_events(self, events, mouse_position=None):
+		"""Manage pygame events queue, @mouse_position synchronizes the input state cursor (see InputState.process)"""
+
+		# Per-frame input state for the systems
+		input_state.process(events, mouse_position)
 
 		for ev in events:
 
@@ -98,6 +116,10 @@ class GameManager():
 				self.running = False
 				return
 
+			# The window contents were lost (e.g. uncovered), push the whole screen again
+			if ev.type == pygame.WINDOWEXPOSED:
+				display_regions.invalidate()
+
 			# Debugging keys
 			if ev.type == pygame.KEYDOWN:
 
@@ -108,12 +130,12 @@ class GameManager():
 				# Toggle debug
 				if ev.key == pygame.K_k:
 					self.debug = not self.debug
-					esper.dispatch_event("toggle_debug", self.debug)
+					event_bus.post("toggle_debug", self.debug)
 
 				# Toggle collision systems
 				if ev.key == pygame.K_c:
 					self.collisions = not self.collisions
-					esper.dispatch_event("toggle_collisions", self.collisions)
+					event_bus.post("toggle_collisions", self.collisions)
 
 				# Reset world manager
 				if ev.key == pygame.K_0:
@@ -131,22 +153,67 @@ class GameManager():
 				if ev.key == pygame.K_5:
 					self.target_fps = 144
 
+				# Pause the game time (timers, animations and simulation)
+				if ev.key == pygame.K_PAUSE:
+					frame_clock.paused = not frame_clock.paused
+
 				# Change scenes
 				if ev.key == pygame.K_ESCAPE:
 					self.world.set_active("main_menu")
 				if ev.key == pygame.K_p:
 					self.world.set_active("rendering_demo")
 
-	def run(self):
-		"""Game loop"""
+	def frame(self, dt=None):
+		"""Run a single, uncapped, game loop iteration. @dt (real seconds) defaults to the time since the previous frame"""
+		now = time.perf_counter()
+		if dt is None: dt = min( MAX_FRAME_TIME, now - self.last_frame )
+		self.last_frame = now
+
+		with profile_zone("frame"):
+			# Recorded, or replayed instead of the live ones
+			events = pygame.event.get()
+			mouse_position = pygame.mouse.get_pos() if input_state.mouse_sync else None
+			if self.session: events, dt, mouse_position = self.session.poll(events, dt, mouse_position)
 
-		while self.running:
 			# General event handler
-			self.handle_events(pygame.event.get())
+			self.handle_events(events, mouse_position)
+
+			# Deliver the game events posted since the previous frame
+			event_bus.flush()
+
+			# Game time of this frame (scaled, zero while paused), due timers expire in a single batch
+			dt = frame_clock.advance(dt)
+			with profile_zone("timers"):
+				timer_wheel.advance(frame_clock.ticks)
 
 			# Update current level
-			self.world.update(self.fixed_dt)
+			self.world.update(dt)
+
+			# Debug stats
+			self.overlay.draw(self.screen)
+
+		profiler.end_frame()
+
+	def present(self):
+		"""Push the areas changed by the last frame to the display"""
+		with profile_zone("present"):
+			display_regions.update()
+
+		if self.first_frame is None: self.on_first_frame()
+
+	def on_first_frame(self):
+		"""Record the time to first frame of this launch"""
+		self.first_frame = time.perf_counter() - self.started
+		profiler.record( "startup.first_frame", self.first_frame * 1000.0 )
+		# stderr: headless runs (benchmarks) keep their stdout for reports
+		print( "First frame in {:.0f} ms (target {:.0f} ms)".format( self.first_frame * 1000.0, STARTUP_TARGET ), file = sys.stderr )
+
+	def run(self):
+		"""Game loop"""
+
+		while self.running:
+			self.frame()
 
 			# Display updates
 			self.clock.tick(self.target_fps)
-			pygame.display.update()
+			self.present()
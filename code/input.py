@@ -0,0 +1,67 @@
+import pygame
+from code.settings import INPUT_BINDINGS, MOUSE_BUTTON
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class InputState:
+	"""Keyboard and mouse state of the current frame, built from the pygame event queue
+
+	Inputs (key codes and (MOUSE_BUTTON, button) pairs) are "held" while down, "pressed" and "released" only
+	during the frame their event has been received: a press fires exactly once, however long the input is held.
+	Systems query actions (see INPUT_BINDINGS) rather than raw inputs.
+	"""
+
+	def __init__(self, bindings = INPUT_BINDINGS):
+		self.bindings 	= bindings 	# action => inputs
+
+		self.held 		= set()
+		self.pressed 	= set()
+		self.released 	= set()
+		self.mouse_position = (0, 0)
+		# Motion events only report a moving cursor: its position is taken from pygame.mouse at startup and
+		# after each scene change (see GameManager.frame)
+		self.mouse_sync = True
+
+	def process(self, events, mouse_position = None):
+		"""Start a new frame with the given pygame @events, and the cursor position when synchronizing it"""
+		self.pressed.clear()
+		self.released.clear()
+
+		if mouse_position is not None:
+			self.mouse_position = tuple(mouse_position)
+			self.mouse_sync = False
+
+		for ev in events:
+			if ev.type == pygame.KEYDOWN: 			self.press( ev.key )
+			elif ev.type == pygame.KEYUP: 			self.release( ev.key )
+			elif ev.type == pygame.MOUSEBUTTONDOWN: self.press( (MOUSE_BUTTON, ev.button) )
+			elif ev.type == pygame.MOUSEBUTTONUP: 	self.release( (MOUSE_BUTTON, ev.button) )
+			elif ev.type == pygame.MOUSEMOTION: 	self.mouse_position = ev.pos
+			# Release events are lost while the window is out of focus
+			elif ev.type == pygame.WINDOWFOCUSLOST: self.held.clear()
+
+	def press(self, key):
+		self.held.add(key)
+		self.pressed.add(key)
+
+	def release(self, key):
+		self.held.discard(key)
+		self.released.add(key)
+
+	def is_held(self, action):
+		return not self.held.isdisjoint( self.bindings[action] )
+
+	def was_pressed(self, action):
+		return not self.pressed.isdisjoint( self.bindings[action] )
+
+	def was_released(self, action):
+		return not self.released.isdisjoint( self.bindings[action] )
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+# Shared by every system, updated once per frame by the GameManager
+input_state = InputState()
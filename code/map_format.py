@@ -0,0 +1,122 @@
+#
+# Binary level format
+#
+#	header: 		magic (4 bytes), version (uint16), layers count (uint16), width (uint32), height (uint32)
+#	layer table: 	for each layer, name (16 bytes, zero padded utf-8) and data offset from the file start (uint64)
+#	layer data: 	for each layer, width * height little-endian int16 tile ids (row-major, -1 = empty cell)
+#
+# Convert the per-layer text maps with:
+#
+#	python -m code.map_format demo water ground main ceiling
+#
+
+import struct
+import numpy
+from os.path import join
+from code.settings import MAPS_FOLDER
+
+
+MAP_MAGIC 		= b"HWAM"
+MAP_VERSION 	= 1
+MAP_EXTENSION 	= "map"
+
+TILE_DTYPE 		= numpy.dtype("<i2")
+TILE_EMPTY 		= -1
+
+_HEADER 		= struct.Struct("<4sHHII")
+_LAYER_ENTRY 	= struct.Struct("<16sQ")
+_ALIGNMENT 		= 16
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def binary_map_path(file_name, folder = MAPS_FOLDER):
+	"""Binary level file for @file_name"""
+	return join( folder, "{}.{}".format(file_name, MAP_EXTENSION) )
+
+
+def text_layer_path(file_name, layer, folder = MAPS_FOLDER):
+	"""Text map file for a single @layer of @file_name"""
+	return join( folder, "{}_{}.txt".format(file_name, layer) )
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def read_text_layer(path):
+	"""Parse a text map layer (space separated tile ids, one row per line) into an int16 array"""
+	with open( path, "r" ) as fin:
+		rows = [ line.split() for line in fin if line.strip() ]
+	return numpy.array( rows, dtype = TILE_DTYPE )
+
+
+def read_binary_map(path):
+	"""Memory-map a binary level, returns (width, height, { layer name: int16 array view })
+
+	Layer arrays are copy-on-write views of the file: edits stay in memory and never reach the disk.
+	"""
+	raw = numpy.memmap( path, dtype = numpy.uint8, mode = "c" )
+
+	magic, version, count, width, height = _HEADER.unpack_from( raw, 0 )
+	if magic != MAP_MAGIC:
+		raise ValueError("Not a binary map file: {}".format(path))
+	if version != MAP_VERSION:
+		raise ValueError("Unsupported binary map version {}: {}".format(version, path))
+
+	layers = {}
+	layer_bytes = width * height * TILE_DTYPE.itemsize
+	for index in range(count):
+		name, offset = _LAYER_ENTRY.unpack_from( raw, _HEADER.size + index * _LAYER_ENTRY.size )
+		name = name.rstrip(b"\0").decode("utf-8")
+		layers[name] = raw[offset:offset + layer_bytes].view(TILE_DTYPE).reshape( (height, width) )
+
+	return width, height, layers
+
+
+def write_binary_map(path, layers):
+	"""Write @layers ({ layer name: 2d tile ids array }, all with the same shape) as a binary level"""
+	arrays = { name: numpy.asarray( data, dtype = TILE_DTYPE ) for name, data in layers.items() }
+	shapes = { array.shape for array in arrays.values() }
+	if len(shapes) != 1:
+		raise ValueError("Map layers have different sizes: {}".format(shapes))
+	height, width = shapes.pop()
+
+	# Layer data starts after the header and the layer table, aligned for faster array access
+	offset = _HEADER.size + len(arrays) * _LAYER_ENTRY.size
+	offset += -offset % _ALIGNMENT
+	layer_bytes = width * height * TILE_DTYPE.itemsize
+
+	with open( path, "wb" ) as fout:
+		fout.write( _HEADER.pack( MAP_MAGIC, MAP_VERSION, len(arrays), width, height ) )
+		for index, name in enumerate(arrays):
+			encoded = name.encode("utf-8")
+			if len(encoded) > 16:
+				raise ValueError("Map layer name too long: {}".format(name))
+			fout.write( _LAYER_ENTRY.pack( encoded, offset + index * layer_bytes ) )
+		fout.write( bytes( offset - fout.tell() ) )
+		for array in arrays.values():
+			fout.write( numpy.ascontiguousarray(array).tobytes() )
+
+
+def convert_text_map(file_name, layers, folder = MAPS_FOLDER):
+	"""Convert the text layers of @file_name into a single binary level, returns the new file path"""
+	path = binary_map_path( file_name, folder )
+	write_binary_map( path, { layer: read_text_layer( text_layer_path(file_name, layer, folder) ) for layer in layers } )
+	return path
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+if __name__ == '__main__':
+	# Command line only, kept out of the game startup imports
+	import argparse
+
+	parser = argparse.ArgumentParser(description = "Convert <name>_<layer>.txt maps into a binary <name>.map level")
+	parser.add_argument("name", help = "map name, e.g. demo")
+	parser.add_argument("layers", nargs = "+", help = "layer names, in rendering order")
+	parser.add_argument("--folder", default = MAPS_FOLDER, help = "maps folder")
+	args = parser.parse_args()
+
+	print( convert_text_map( args.name, args.layers, args.folder ) )
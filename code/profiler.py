@@ -0,0 +1,199 @@
+import json
+import queue
+import threading
+import time
+import numpy
+import pygame
+from code.display import display_regions
+from code.events import event_bus
+from code.settings import (
+	PROFILING_ENABLED,
+	PROFILING_FLUSH_INTERVAL,
+	PROFILING_OVERLAY_COLOR,
+	PROFILING_PATH,
+	PROFILING_WINDOW
+)
+from code.text import text_cache
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class RingBuffer:
+	"""Fixed-size float samples history, oldest samples are overwritten"""
+
+	def __init__(self, size = PROFILING_WINDOW):
+		self.samples 	= numpy.zeros( size )
+		self.index 		= 0
+		self.count 		= 0
+
+	def append(self, value):
+		self.samples[self.index] = value
+		self.index = (self.index + 1) % len(self.samples)
+		if self.count < len(self.samples): self.count += 1
+
+	def stats(self):
+		"""min/avg/p95/max over the sliding window"""
+		if not self.count: return None
+		window = self.samples[:self.count]
+		return {
+			"min": float( window.min() ),
+			"avg": float( window.mean() ),
+			"p95": float( numpy.percentile(window, 95) ),
+			"max": float( window.max() )
+		}
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class Profiler:
+	"""In-memory profiling: per-zone durations (milliseconds) and per-frame counters over a sliding window"""
+
+	def __init__(self, enabled = PROFILING_ENABLED, path = PROFILING_PATH):
+		self.enabled 	= False
+		self.path 		= path 	# Stats are periodically flushed here while enabled, None to disable
+
+		self.zones 		= {} 	# zone name => RingBuffer of durations
+		self.counters 	= {} 	# counter name => RingBuffer of per-frame totals
+		self.current 	= {} 	# counter name => current frame total
+
+		# Asynchronous flush
+		self._queue 		= queue.Queue()
+		self._writer 		= None
+		self._last_flush 	= time.perf_counter()
+
+		self.set_enabled(enabled)
+
+	def set_enabled(self, value):
+		"""Start (or stop) recording. The background writer starts when first enabled and runs until shutdown,
+		toggling never restarts it (nor truncates the stats file)"""
+		self.enabled = value
+		if value and self.path and not self._writer:
+			self._writer = threading.Thread( target = self._write_loop, name = "profiler-writer", daemon = True )
+			self._writer.start()
+
+	def record(self, zone, milliseconds):
+		"""Add a duration sample to @zone"""
+		buffer = self.zones.get(zone)
+		if buffer is None: buffer = self.zones[zone] = RingBuffer()
+		buffer.append(milliseconds)
+
+	def count(self, counter, amount = 1):
+		"""Increment a per-frame counter (blits, collision probes...)"""
+		if not self.enabled: return
+		self.current[counter] = self.current.get(counter, 0) + amount
+
+	def end_frame(self):
+		"""Store the current frame counters and schedule a flush when it is time to"""
+		if not self.enabled: return
+
+		for counter, buffer in self.counters.items():
+			buffer.append( self.current.pop(counter, 0) )
+		# First appearance of a counter
+		for counter, value in self.current.items():
+			self.counters[counter] = RingBuffer()
+			self.counters[counter].append(value)
+		self.current.clear()
+
+		now = time.perf_counter()
+		if self._writer and now - self._last_flush >= PROFILING_FLUSH_INTERVAL:
+			self._last_flush = now
+			self._queue.put( self.snapshot() )
+
+	def snapshot(self):
+		"""Current stats of every zone and counter"""
+		return {
+			"time": 	round( time.time(), 3 ),
+			"zones": 	{ name: buffer.stats() for name, buffer in self.zones.items() },
+			"counters": { name: buffer.stats() for name, buffer in self.counters.items() }
+		}
+
+	def shutdown(self):
+		"""Stop recording and the background writer, pending stats are still written"""
+		self.set_enabled(False)
+		writer = self._writer
+		if writer:
+			self._queue.put(None)
+			writer.join( timeout = 1.0 )
+			self._writer = None
+
+	def _write_loop(self):
+		"""Background thread: write snapshots (one JSON object per line) until a None is received"""
+		with open( self.path, "w" ) as fout:
+			while True:
+				snapshot = self._queue.get()
+				if snapshot is None: break
+				fout.write( json.dumps(snapshot) + "\n" )
+				fout.flush()
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class ProfilerOverlay:
+	"""Profiler stats drawn on top of the current scene, visible while debugging"""
+
+	def __init__(self, profiler, refresh = 500):
+		self.profiler 	= profiler
+		self.refresh 	= refresh 	# Text update interval (milliseconds), rendering text every frame is slow
+		self.visible 	= False
+
+		self.font 			= text_cache.font(20)
+		self.surface 		= None
+		self.last_refresh 	= 0
+
+		event_bus.subscribe( "toggle_debug", self.on_toggle_debug )
+
+	def on_toggle_debug(self, value):
+		"""Show stats and start recording them"""
+		self.visible = value
+		self.surface = None
+		self.profiler.set_enabled( value or PROFILING_ENABLED )
+
+	def lines(self):
+		"""Overlay text, one line per zone and counter"""
+		snapshot = self.profiler.snapshot()
+		lines = []
+		for name, stats in sorted( snapshot["zones"].items() ):
+			if not stats: continue
+			lines.append( "{:<40} min {min:6.2f}  avg {avg:6.2f}  p95 {p95:6.2f}  max {max:6.2f} ms".format(name[-40:], **stats) )
+		for name, stats in sorted( snapshot["counters"].items() ):
+			if not stats: continue
+			lines.append( "{:<40} min {min:6.0f}  avg {avg:6.1f}  p95 {p95:6.0f}  max {max:6.0f}".format(name[-40:], **stats) )
+		return lines
+
+	def render(self):
+		"""Build the overlay surface: one text line per zone and counter over a translucent background"""
+		lines = [ self.font.render(line, True, PROFILING_OVERLAY_COLOR) for line in self.lines() ]
+		if not lines: return None
+
+		width = max( line.get_width() for line in lines ) + 16
+		height = sum( line.get_height() for line in lines ) + 16
+		surface = pygame.Surface( (width, height), flags = pygame.SRCALPHA )
+		surface.fill( (0, 0, 0, 160) )
+
+		y = 8
+		for line in lines:
+			surface.blit( line, (8, y) )
+			y += line.get_height()
+		return surface
+
+	def draw(self, screen):
+		if not self.visible: return
+
+		now = time.perf_counter() * 1000.0
+		if not self.surface or now - self.last_refresh >= self.refresh:
+			self.surface = self.render()
+			self.last_refresh = now
+
+		if self.surface: screen.blit( self.surface, (8, 8) )
+		# Drawn over the scene, which may only have redrawn its changed areas
+		display_regions.invalidate()
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+# Shared by every system
+profiler = Profiler()
@@ -0,0 +1,169 @@
+#
+# Input sessions: the rng seed, frame times, input events and cursor syncs of a game session, plus the frames its worlds
+# were loaded and the scenes it showed. Recorded by the game (python launcher.py --record <file>), then fed
+# back headless to run the very same session again (python -m benchmarks.replay <file>)
+#
+
+import gzip
+import json
+import random
+import pygame
+from code.events import event_bus
+from code.settings import GAME_VERSION
+from code.utils import rng
+
+
+REPLAY_VERSION = 2
+
+# Recorded pygame events and their attributes, everything else only matters to the live window
+_EVENT_FIELDS = {
+	pygame.KEYDOWN: 			( "key", "mod", "unicode", "scancode" ),
+	pygame.KEYUP: 				( "key", "mod", "unicode", "scancode" ),
+	pygame.MOUSEBUTTONDOWN: 	( "pos", "button" ),
+	pygame.MOUSEBUTTONUP: 		( "pos", "button" ),
+	pygame.MOUSEMOTION: 		( "pos", "rel", "buttons" ),
+	pygame.WINDOWFOCUSLOST: 	(),
+	pygame.WINDOWEXPOSED: 		(),
+	pygame.QUIT: 				()
+}
+
+# Event names are stored rather than pygame event type numbers
+_EVENT_TYPES = { pygame.event.event_name(event_type): event_type for event_type in _EVENT_FIELDS }
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def encode_event(ev):
+	"""[ event name, { attribute: value } ] of a recorded pygame event, None for the other ones"""
+	fields = _EVENT_FIELDS.get(ev.type)
+	if fields is None: return None
+	return [ pygame.event.event_name(ev.type), { field: getattr(ev, field) for field in fields if hasattr(ev, field) } ]
+
+
+def decode_event(name, attributes):
+	"""pygame event of an encode_event result"""
+	attributes = { field: tuple(value) if isinstance(value, list) else value for field, value in attributes.items() }
+	return pygame.event.Event( _EVENT_TYPES[name], attributes )
+
+
+class InputSession:
+	"""Everything a game session depends on, saved as gzipped JSON (floats are written exactly)"""
+
+	def __init__(self, seed = 0):
+		self.seed 			= seed 	# Shared rng seed (see code.utils.rng)
+		self.frame_times 	= [] 	# Frame time (seconds) passed to GameManager.frame, one per frame
+		self.events 		= {} 	# Frame => [ encoded events ]
+		self.mouse 			= {} 	# Frame => cursor position read from pygame.mouse (see InputState.process)
+		self.loads 			= {} 	# Frame => [ names of the worlds assembled during that frame ]
+		self.scenes 		= [] 	# [ frame, scene name ] for each scene_change delivered
+
+	@property
+	def frames(self):
+		return len(self.frame_times)
+
+	def save(self, path):
+		data = {
+			"version": 		REPLAY_VERSION,
+			"game_version": GAME_VERSION,
+			"seed": 		self.seed,
+			"frame_times": 	self.frame_times,
+			"events": 		[ [ frame, events ] for frame, events in self.events.items() ],
+			"mouse": 		[ [ frame, position ] for frame, position in self.mouse.items() ],
+			"loads": 		[ [ frame, names ] for frame, names in self.loads.items() ],
+			"scenes": 		self.scenes
+		}
+		with gzip.open( path, "wt", encoding = "utf-8" ) as fout:
+			json.dump( data, fout, separators = (",", ":") )
+
+	@classmethod
+	def load(cls, path):
+		with gzip.open( path, "rt", encoding = "utf-8" ) as fin:
+			data = json.load(fin)
+		if data.get("version") != REPLAY_VERSION:
+			raise ValueError("Unsupported replay version {}: {}".format(data.get("version"), path))
+
+		session = cls( data["seed"] )
+		session.frame_times = data["frame_times"]
+		session.events 		= { frame: events for frame, events in data["events"] }
+		session.mouse 		= { frame: tuple(position) for frame, position in data["mouse"] }
+		session.loads 		= { frame: names for frame, names in data["loads"] }
+		session.scenes 		= data["scenes"]
+		return session
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class InputRecorder:
+	"""GameManager session (see GameManager.frame) recording the live input into an InputSession
+
+	The shared rng is seeded with @seed (random when None) before any world gets loaded.
+	"""
+
+	def __init__(self, seed = None):
+		if seed is None: seed = random.randrange( 2 ** 32 )
+		self.session 	= InputSession(seed)
+		self.frame 		= -1 	# Current frame
+
+		rng.seed(seed)
+		event_bus.subscribe("scene_change", self.on_scene_change)
+
+	def on_scene_change(self, name):
+		self.session.scenes.append( [ self.frame, name ] )
+
+	def poll(self, events, dt, mouse_position):
+		"""Start a new frame: record and return its @events, frame time @dt and @mouse_position (None when not read)"""
+		self.frame += 1
+		self.session.frame_times.append(dt)
+
+		encoded = [ item for item in map( encode_event, events ) if item is not None ]
+		if encoded: self.session.events[self.frame] = encoded
+		if mouse_position is not None: self.session.mouse[self.frame] = list(mouse_position)
+		return events, dt, mouse_position
+
+	def loading_gate(self, name, future):
+		"""World @name can be assembled once prepared (see WorldManager.update_loading), the frame is recorded"""
+		if not future.done(): return False
+		self.session.loads.setdefault( self.frame, [] ).append(name)
+		return True
+
+	def save(self, path):
+		self.session.save(path)
+
+
+class InputPlayer:
+	"""GameManager session feeding an InputSession back, the live input is ignored
+
+	Worlds are assembled at the frames they were during the recording (waiting for them to be prepared if
+	needed), so the replay does not depend on the loading speed either.
+	"""
+
+	def __init__(self, session):
+		self.session 	= session
+		self.frame 		= -1 	# Current frame
+		self.scenes 	= [] 	# Scene changes of the replay, same layout as InputSession.scenes
+
+		rng.seed(session.seed)
+		event_bus.subscribe("scene_change", self.on_scene_change)
+
+	@property
+	def finished(self):
+		return self.frame + 1 >= self.session.frames
+
+	@property
+	def diverged(self):
+		"""Once the replay stopped: it quit early, or showed other scenes (or at other frames) than the recording"""
+		return not self.finished or self.scenes != self.session.scenes
+
+	def on_scene_change(self, name):
+		self.scenes.append( [ self.frame, name ] )
+
+	def poll(self, events, dt, mouse_position):
+		"""Start a new frame: returns the recorded events, frame time and cursor position"""
+		self.frame += 1
+		events = [ decode_event(*item) for item in self.session.events.get( self.frame, () ) ]
+		return events, self.session.frame_times[self.frame], self.session.mouse.get(self.frame)
+
+	def loading_gate(self, name, future):
+		return name in self.session.loads.get( self.frame, () )
@@ -0,0 +1,65 @@
+from code.profiler import profiler
+from code.settings import SCHEDULER_MAX_STEPS
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class ProcessorScheduler:
+	"""Run the processors of an esper.World, each one at its own rate
+
+	Processors with a "rate" attribute (Hz) run on a fixed timestep: their accumulator collects the real frame
+	time and they are processed once per elapsed step (1 / rate seconds), at most SCHEDULER_MAX_STEPS times
+	per frame. Extra steps are dropped to avoid a spiral of death. After its steps, a processor with an
+	"interpolate" method receives the leftover step fraction to blend render positions between two states.
+	Processors without a rate run once per frame with the real frame time.
+	"""
+
+	def __init__(self, world, max_steps = SCHEDULER_MAX_STEPS):
+		self.world 		= world
+		self.max_steps 	= max_steps
+
+		self.accumulators = {} 	# processor => unsimulated time (seconds)
+
+		# Stats
+		self.catchup_steps = 0 	# Steps run in addition to the first one of a frame
+		self.dropped_steps = 0 	# Steps skipped because of the max_steps limit
+
+	def update(self, dt):
+		"""Advance the world by @dt seconds of real time"""
+		# Same as esper.World.process: finalize entities deletion first
+		self.world._clear_dead_entities()
+
+		for processor in list(self.world._processors):
+			rate = getattr(processor, "rate", None)
+
+			# Every frame
+			if not rate:
+				processor.process(dt)
+				continue
+
+			# Fixed timestep
+			step = 1.0 / rate
+			accumulator = self.accumulators.get(processor, 0.0) + dt
+			steps = 0
+			while accumulator >= step and steps < self.max_steps:
+				processor.process(step)
+				accumulator -= step
+				steps += 1
+
+			# Too far behind, give up on the oldest steps
+			if accumulator >= step:
+				dropped = int(accumulator // step)
+				accumulator -= dropped * step
+				self.dropped_steps += dropped
+				profiler.count( "scheduler.dropped_steps", dropped )
+
+			if steps > 1:
+				self.catchup_steps += steps - 1
+				profiler.count( "scheduler.catchup_steps", steps - 1 )
+
+			self.accumulators[processor] = accumulator
+
+			# Blend between the previous and the current state
+			if hasattr(processor, "interpolate"):
+				processor.interpolate( accumulator / step )
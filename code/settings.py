@@ -7,17 +7,38 @@ GAME_NAME 		= "Hidden Wheelchair Attack"
 GAME_VERSION 	= "0.1"
 
 FPS_LIMIT 			= 60.0
-FIXED_DELTA_TIME 	= 0.01
+MAX_FRAME_TIME 		= 0.25 	# Longer frames (seconds) are clamped, e.g. after a window drag
+
+# Processors rates (Hz), see code.scheduler. Processors without a rate run once per frame
+PHYSICS_RATE 		= 60
+ANIMATION_RATE 		= 30
+SCHEDULER_MAX_STEPS = 5 	# Maximum catch-up steps per processor and frame
+
+# Timers (see code.timer): hierarchical timing wheel of 1 ms ticks, SLOTS ** LEVELS ms before a re-cascade
+TIMER_WHEEL_SLOTS 	= 64
+TIMER_WHEEL_LEVELS 	= 4
+
+# Time to first frame (milliseconds) from launch, checked by "python -m benchmarks.startup"
+STARTUP_TARGET 		= 1000
 
 SCREEN_MODE_FLAGS = pygame.DOUBLEBUF
 #SCREEN_MODE_FLAGS = pygame.FULLSCREEN | pygame.DOUBLEBUF
 
-PROFILING_MODE = "w+"
-PROFILING_PATH = "profiling.txt"
-PROFILING_FILE = open(PROFILING_PATH, PROFILING_MODE)
+# Profiling (see code.profiler): always on when debugging, stats are flushed to PROFILING_PATH while enabled
+PROFILING_ENABLED 			= False
+PROFILING_PATH 				= "profiling.txt"
+PROFILING_WINDOW 			= 240 	# Samples kept for each zone/counter
+PROFILING_FLUSH_INTERVAL 	= 1.0 	# seconds
+PROFILING_OVERLAY_COLOR 	= (240, 240, 240)
 
 # Resources
 GRAPHICS_FOLDER = os.path.join(pathlib.Path(__file__).parent.resolve().parent, "graphics")
+MAPS_FOLDER 	= os.path.join(pathlib.Path(__file__).parent.resolve().parent, "data", "maps")
+ATLAS_FOLDER 	= os.path.join(GRAPHICS_FOLDER, "atlas") 	# Built by "python -m code.atlas"
+
+# Atlas pages size and largest packed image (pixels, per side), larger images stay loose files
+ATLAS_PAGE_SIZE 		= 2048
+ATLAS_MAX_IMAGE_SIZE 	= 512
 
 SPRITE_UNKNOWN 	= "unknown.png"
 SPRITE_CLOUD 	= "cloud.png"
@@ -25,6 +46,12 @@ SPRITE_FLOOR 	= "floor.png"
 SPRITE_WALL 	= "wall.png"
 SPRITE_WATER 	= "water.png"
 
+ASSET_CACHE_BUDGET = 64 * 1024 * 1024 	# Decoded surfaces kept in memory (bytes)
+
+# Text
+TEXT_FONT 			= None 				# System font name, None is the pygame default font
+TEXT_CACHE_BUDGET 	= 4 * 1024 * 1024 	# Rendered text surfaces kept in memory (bytes)
+
 # Window
 WINDOW_TITLE = GAME_NAME
 
@@ -37,6 +64,21 @@ VIEWPORT_HEIGHT = SCREEN_HEIGHT
 # Map
 TILE_SIZE = 48
 
+# Map layers are rendered in square chunks of MAP_CHUNK_SIZE tiles, baked when they first come into view.
+# Chunks farther than MAP_CHUNK_EVICTION_RADIUS chunks from the viewport are dropped
+MAP_CHUNK_SIZE 				= 16
+MAP_CHUNK_EVICTION_RADIUS 	= 2
+
+# Chunks coming into view can be baked off-frame by MAP_BAKE_WORKERS processes (None: one per extra cpu
+# core), they are drawn once baked. 0 bakes them in the game process, during the frame they come into view
+MAP_BAKE_WORKERS 			= None
+
+# Static walls ("main" map layer) are baked into horizontal strips of at most WALL_STRIP_LENGTH tiles
+WALL_STRIP_LENGTH = MAP_CHUNK_SIZE
+
+# Collision broad phase grid cell size (pixels)
+SPATIAL_HASH_CELL_SIZE = TILE_SIZE * 2
+
 # Physics
 VECTOR_ZERO 			= pygame.Vector2(0, 0)
 SPEED_MAX 				= 20.0 		# TODO Test value and change it to the desired max speed
@@ -45,6 +87,7 @@ SPEED_BASE 				= 10.0
 SPEED_BASE_FACTOR 		= 1.0 		# Multiplier used to have a small base speed
 FRICTION_BASE_FLOOR 	= 0.5 		# 0.5 = almost meaningless, 0.1 = meaningful
 ACCELERATION_BASE_FLOOR = 0.5 		# 0.5 = almost meaningless, 0.1 = meaningful
+PHYSICS_BATCHED 		= False 	# Integrate all bodies at once with numpy (BatchedPhysicsSimulation)
 
 # Colors
 STATIC_SPRITE_DEBUG_COLOR 	= (40, 220, 220)
@@ -61,16 +104,39 @@ RENDERING_LAYERS = {
 	"ceiling": 	 3
 }
 
+# While the camera stands still only changed areas are redrawn, unless they cover more than
+# RENDERING_DIRTY_MAX_AREA of the viewport (a full redraw is cheaper then)
+RENDERING_DIRTY_RECTS 		= True
+RENDERING_DIRTY_MAX_AREA 	= 0.5
+
 # Animations
-ANIM_SPEED_DINOSAUR 	= 12 	# TODO animation speed unit is ?
+ANIM_SPEED_DINOSAUR 	= 7 	# frames per second
 ANIM_DURATION_DINOSAUR 	= 0 	# in milliseconds
 ANIM_TABLE_DINOSAUR 	= { "idle": [], "moving": [], "hurt": [], "kick": [] }
 
-ANIM_SPEED_EXPLOSION 	= 12 	# TODO animation speed unit is ?
+ANIM_SPEED_EXPLOSION 	= 7 	# frames per second
 ANIM_DURATION_EXPLOSION = 1500 	# in milliseconds
 ANIM_TABLE_EXPLOSION 	= { "big": [] }
 
+# Pooled effects (see code.effects)
+EFFECT_POOL_CEILING 	= 128 	# Maximum entities per pool, spawns above it are dropped
+EFFECT_SCALE_BUCKETS 	= 8 	# Prebuilt frame sizes per pool
+
 # Player actions (in milliseconds)
 PLAYER_COOLDOWN_BOMB 	= 1000
 PLAYER_DURATION_ATTACK 	= 500
 PLAYER_DURATION_HURT 	= 500
+
+# Input bindings (see code.input): action => keys and mouse buttons (MOUSE_BUTTON + pygame button number)
+MOUSE_BUTTON 	= "mouse"
+INPUT_BINDINGS 	= {
+	"move_up": 		( pygame.K_w, pygame.K_UP ),
+	"move_down": 	( pygame.K_s, pygame.K_DOWN ),
+	"move_left": 	( pygame.K_a, pygame.K_LEFT ),
+	"move_right": 	( pygame.K_d, pygame.K_RIGHT ),
+	"bomb": 		( pygame.K_n, ),
+	"explosions": 	( pygame.K_b, ),
+	"hurt": 		( pygame.K_h, ),
+	"kick": 		( pygame.K_m, ),
+	"select": 		( (MOUSE_BUTTON, 1), ),
+}
@@ -0,0 +1,98 @@
+from code.settings import SPATIAL_HASH_CELL_SIZE
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class SpatialHash:
+	"""Uniform grid of buckets mapping world cells to the keys (e.g. entity ids) of the rects overlapping them"""
+
+	def __init__(self, cell_size = SPATIAL_HASH_CELL_SIZE):
+		self.cell_size = cell_size
+
+		self.buckets 	= {} 	# (cell_x, cell_y) => set of keys
+		self.rects 		= {} 	# key => rect (reference, not a copy)
+		self.cells 		= {} 	# key => cells range (min_x, min_y, max_x, max_y) currently occupied
+
+	def __contains__(self, key):
+		return key in self.rects
+
+	def __len__(self):
+		return len(self.rects)
+
+	def cells_range(self, rect):
+		"""Grid cells covered by @rect as (min_x, min_y, max_x, max_y), bounds included"""
+		size = self.cell_size
+		return (
+			rect.left // size,
+			rect.top // size,
+			(rect.right - 1) // size if rect.w > 0 else rect.left // size,
+			(rect.bottom - 1) // size if rect.h > 0 else rect.top // size
+		)
+
+	def insert(self, key, rect):
+		"""Add @key to every bucket overlapped by @rect"""
+		if key in self.rects: self.remove(key)
+
+		cells = self.cells_range(rect)
+		self.rects[key] = rect
+		self.cells[key] = cells
+
+		buckets = self.buckets
+		for cell_y in range(cells[1], cells[3] + 1):
+			for cell_x in range(cells[0], cells[2] + 1):
+				bucket = buckets.get((cell_x, cell_y))
+				if bucket is None:
+					bucket = buckets[(cell_x, cell_y)] = set()
+				bucket.add(key)
+
+	def remove(self, key):
+		"""Remove @key from the grid (silently ignores unknown keys)"""
+		cells = self.cells.pop(key, None)
+		if cells is None: return
+		del self.rects[key]
+
+		buckets = self.buckets
+		for cell_y in range(cells[1], cells[3] + 1):
+			for cell_x in range(cells[0], cells[2] + 1):
+				bucket = buckets[(cell_x, cell_y)]
+				bucket.discard(key)
+				# Keep the grid sparse
+				if not bucket: del buckets[(cell_x, cell_y)]
+
+	def move(self, key, rect):
+		"""Update @key position, buckets are only touched when the covered cells change"""
+		if self.cells.get(key) == self.cells_range(rect):
+			self.rects[key] = rect
+			return
+		self.insert(key, rect)
+
+	def query(self, rect):
+		"""Keys whose buckets overlap @rect (broad phase, candidates may not actually collide)"""
+		cells = self.cells_range(rect)
+		buckets = self.buckets
+		found = set()
+		for cell_y in range(cells[1], cells[3] + 1):
+			for cell_x in range(cells[0], cells[2] + 1):
+				bucket = buckets.get((cell_x, cell_y))
+				if bucket: found |= bucket
+		return found
+
+	def collides(self, rect, exclude = None):
+		"""Check if @rect overlaps any indexed rect (except for the @exclude key), stops at the first hit"""
+		cells = self.cells_range(rect)
+		buckets = self.buckets
+		rects = self.rects
+		for cell_y in range(cells[1], cells[3] + 1):
+			for cell_x in range(cells[0], cells[2] + 1):
+				bucket = buckets.get((cell_x, cell_y))
+				if not bucket: continue
+				for key in bucket:
+					if key != exclude and rects[key].colliderect(rect):
+						return True
+		return False
+
+	def clear(self):
+		self.buckets.clear()
+		self.rects.clear()
+		self.cells.clear()
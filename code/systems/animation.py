@@ -1,26 +1,40 @@
 from esper import Processor
+from code.components.effect import PooledEffect
 from code.components.sprite import AnimatedSprite
+from code.settings import ANIMATION_RATE
 
 
 # -------------------------------------------------------------------------------------------------
 
 
 class AnimationController(Processor):
-	"""Update all AnimatedSprite components"""
+	"""Remove completed AnimatedSprite components (frames themselves are derived from the frame clock)"""
 
-	def process(self, dt):
-		# Animations completed during the current frame
-		completed_animations = []
+	# Fixed steps per second (see code.scheduler)
+	rate = ANIMATION_RATE
+
+	def __init__(self):
+		# Entity => AnimatedSprite that can complete (timed or one-shot), see code.world.World.subscribe
+		self.timed = None
 
-		# Update all animations
-		for ent, animation in self.world.get_component(AnimatedSprite):
+	def on_added(self, ent, sprite):
+		if sprite.duration or not sprite.loop: self.timed[ent] = sprite
 
-			animation.update(dt)
+	def on_removed(self, ent, sprite):
+		if self.timed.get(ent) is sprite: del self.timed[ent]
 
-			# The current animation needs to be deleted
-			if animation.completed:
-				completed_animations.append(ent)
+	def process(self, dt):
+		# Track animations from the first run, looping ones never need a check
+		if self.timed is None:
+			self.timed = {}
+			self.world.subscribe( AnimatedSprite, self.on_added, self.on_removed )
+
+		# Animations completed during the current frame
+		completed_animations = [ ent for ent, animation in self.timed.items() if animation.completed ]
 
-		# Delete all completed animations
+		# Delete all completed animations, pooled effects are recycled instead
 		for entity in completed_animations:
-			self.world.delete_entity(entity)
+			del self.timed[entity]
+			effect = self.world.try_component(entity, PooledEffect)
+			if effect: 	effect.pool.release(self.world, entity)
+			else: 		self.world.delete_entity(entity)
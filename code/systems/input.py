@@ -1,10 +1,11 @@
-import random
 import pygame # TODO Only import necessary variables/functions/classes
-from copy 	import deepcopy
 from esper 	import Processor
 from code.components.controller import PlayerController
 from code.components.physics 	import PhysicsBody
 from code.components.sprite 	import AnimatedSprite
+from code.effects 				import EffectPool
+from code.input 				import input_state
+from code.utils 				import rng
 from code.settings import (
 	ANIM_DURATION_EXPLOSION,
 	ANIM_SPEED_EXPLOSION,
@@ -19,66 +20,56 @@ from code.settings import (
 class InputHandler(Processor):
 	"""Player controls management: movement, actions, animation status, etc."""
 
+	def __init__(self, explosions=None):
+		# Recycled explosion effects
+		self.explosions = explosions
+		if not self.explosions:
+			self.explosions = EffectPool(	folder = "explosions",
+											frames_table = ANIM_TABLE_EXPLOSION,
+											duration = ANIM_DURATION_EXPLOSION,
+											speed = ANIM_SPEED_EXPLOSION,
+											layer = RENDERING_LAYERS["main"] )
+
 	def _test_spawn_explosion(self, position):
 		"""Create an explosion with random dimensions centered at @position"""
-
-		explosion = self.world.create_entity()
-
-		scale = random.randint(48, 256)
-		spawn = position
-
-		sprite = AnimatedSprite(	duration = ANIM_DURATION_EXPLOSION,
-									folder = "explosions",
-									frames_table = deepcopy( ANIM_TABLE_EXPLOSION ),
-									layer = RENDERING_LAYERS["main"],
-									scale_size = ( scale, scale ),
-									spawn_point = spawn,
-									speed = ANIM_SPEED_EXPLOSION )
-
-		self.world.add_component( explosion, sprite )
+		self.explosions.spawn( self.world, position, rng.randint(48, 256) )
 
 	def process(self, dt):
-		pressed = pygame.key.get_pressed()
 		for ent, (body, ctrl, sprite) in self.world.get_components(PhysicsBody, PlayerController, AnimatedSprite):
 
 			# Skip inactive controllers
 			if not ctrl.active: continue
 
-			# Update timers and cooldowns
-			ctrl.update()
-
 			# Reset movement direction
 			body.direction = pygame.Vector2(0, 0)
 
 			# Update direction based on user input
-			if pressed[pygame.K_w] or pressed[pygame.K_UP]: 	body.direction += (0, -1)
-			if pressed[pygame.K_s] or pressed[pygame.K_DOWN]: 	body.direction += (0,  1)
-			if pressed[pygame.K_a] or pressed[pygame.K_LEFT]: 	body.direction += (-1, 0)
-			if pressed[pygame.K_d] or pressed[pygame.K_RIGHT]: 	body.direction += ( 1, 0)
+			if input_state.is_held("move_up"): 		body.direction += (0, -1)
+			if input_state.is_held("move_down"): 	body.direction += (0,  1)
+			if input_state.is_held("move_left"): 	body.direction += (-1, 0)
+			if input_state.is_held("move_right"): 	body.direction += ( 1, 0)
 
-			# Spawn a "bomb" (explosion with usage cooldown)
+			# Spawn a "bomb" (explosion with usage cooldown, repeated while held)
 			if not ctrl.cooldowns["bomb"].active:
-				if pressed[pygame.K_n]:
+				if input_state.is_held("bomb"):
 					self._test_spawn_explosion(body.position)
 					ctrl.cooldowns["bomb"].activate()
 
 			# Continuously spawn explosions
-			if pressed[pygame.K_b]:
+			if input_state.is_held("explosions"):
 				self._test_spawn_explosion(body.position)
 
-			# Test "hurt" animation
+			# Test "hurt" animation (once per key press)
 			if not ctrl.timers["hurt"].active:
-				if pressed[pygame.K_h]:
-					sprite.status = "hurt"
-					sprite.frame_index = 0
+				if input_state.was_pressed("hurt"):
+					sprite.play("hurt")
 					ctrl.timers["hurt"].activate()
 					continue
 
-			# Attack animation (cannot attack while getting hurt)
+			# Attack animation (cannot attack while getting hurt, once per key press)
 			if not ctrl.timers["kick"].active and not ctrl.timers["hurt"].active:
-				if pressed[pygame.K_m]:
-					sprite.status = "kick"
-					sprite.frame_index = 0
+				if input_state.was_pressed("kick"):
+					sprite.play("kick")
 					ctrl.timers["kick"].activate()
 					continue
 
@@ -1,15 +1,17 @@
+import numpy
 import pygame
-from esper import Processor, set_handler
+from esper import Processor
 from code.components.hitbox 	import Hitbox
 from code.components.map 		import TileMap
 from code.components.physics 	import PhysicsBody
 from code.components.sprite 	import AnimatedSprite
+from code.spatial_hash 			import SpatialHash
 from code.settings import (
-	FPS_LIMIT,
-	TILE_SIZE,
+	PHYSICS_RATE,
 	VECTOR_ZERO,
 )
 from code.decorators import exectime
+from code.profiler import profiler
 
 
 # -------------------------------------------------------------------------------------------------
@@ -18,6 +20,9 @@ from code.decorators import exectime
 class PhysicsSimulation(Processor):
 	"""Simulate entities movement on a fixed timestep basis"""
 
+	# Fixed steps per second (see code.scheduler)
+	rate = PHYSICS_RATE
+
 	def __init__(self, bounding_rect):
 		# Defaults to viewport size for the bounding rect
 		if not bounding_rect:
@@ -33,18 +38,19 @@ class PhysicsSimulation(Processor):
 		# Tilemap component reference
 		self.tilemap 			= None
 
+		# Collision broad phase: hitboxes without a PhysicsBody never move (walls, props), the others are
+		# moved inside their grid every time the related body changes position. The grids follow Hitbox and
+		# PhysicsBody additions and removals (see code.world.World.subscribe) from the first run
+		self.hitboxes 			= None 	# entity => Hitbox, every hitbox indexed in the grids below
+		self.static_hitboxes 	= SpatialHash()
+		self.dynamic_hitboxes 	= SpatialHash()
+
 		# Debug flag to toggle collision detection
 		self.collisions_enabled = True
 
-		# Physics frames handling
-		# TODO COMMENT
-		self.steps 			= 0
-		self.max_frameskip 	= 5
-		self.step_ticks 	= 1000 / FPS_LIMIT
-		self.previous_ticks = pygame.time.get_ticks()
-
-		# Event handlers
-		set_handler("toggle_collisions", self.on_toggle_collisions)
+	def register_handlers(self, events):
+		"""Subscribe to the world event bus"""
+		events.subscribe("toggle_collisions", self.on_toggle_collisions)
 
 	def on_toggle_collisions(self, value):
 		"""Toggle collision system"""
@@ -54,7 +60,41 @@ class PhysicsSimulation(Processor):
 		vector.x = round( min(self.max_x - half_width,  max(self.min_x + half_width,  vector.x)) )
 		vector.y = round( min(self.max_y - half_height, max(self.min_y + half_height, vector.y)) )
 
-	def is_valid_position(self, hitbox, position):
+	def index_hitboxes(self):
+		"""Index the existing hitboxes, then follow Hitbox and PhysicsBody changes"""
+		self.hitboxes = {}
+		self.world.subscribe( Hitbox, self.on_hitbox_added, self.on_hitbox_removed )
+		self.world.subscribe( PhysicsBody, self.on_body_changed, self.on_body_changed )
+
+	def on_hitbox_added(self, ent, hitbox):
+		self.hitboxes[ent] = hitbox
+		if self.world.has_component(ent, PhysicsBody):
+			self.dynamic_hitboxes.insert(ent, hitbox.rect)
+		else:
+			self.static_hitboxes.insert(ent, hitbox.rect)
+
+	def on_hitbox_removed(self, ent, hitbox):
+		"""Also called for replaced hitboxes, before their replacement is added"""
+		self.hitboxes.pop(ent, None)
+		self.static_hitboxes.remove(ent)
+		self.dynamic_hitboxes.remove(ent)
+
+	def on_body_changed(self, ent, body):
+		"""A PhysicsBody added to or removed from an entity moves its hitbox to the other grid"""
+		hitbox = self.hitboxes.get(ent)
+		if hitbox is None or (ent in self.dynamic_hitboxes) == self.world.has_component(ent, PhysicsBody): return
+		self.on_hitbox_removed(ent, hitbox)
+		self.on_hitbox_added(ent, hitbox)
+
+	def collides(self, entity, rect):
+		"""Check if @rect overlaps any hitbox, except for the one owned by @entity"""
+		# Broad phase (grid cells around @rect) and narrow phase (exact rects overlap) are done by the grids
+		return (
+			self.static_hitboxes.collides(rect, exclude = entity) or
+			self.dynamic_hitboxes.collides(rect, exclude = entity)
+		)
+
+	def is_valid_position(self, entity, hitbox, position):
 		"""Check map position validity and objects collisions"""
 
 		# Move hitbox to the given position
@@ -62,84 +102,217 @@ class PhysicsSimulation(Processor):
 		new_hitbox.center = ( position.x + hitbox.offset_x, position.y + hitbox.offset_y )
 		new_hitbox.inflate_ip( -16, -16 )
 
-		# Find current position grid cell
-		x = int( position.x / TILE_SIZE )
-		y = int( position.y / TILE_SIZE )
-
-		# Scan map for collidable tiles
-		empty_cells_layer = 0
-		for layer in self.tilemap.layers:
-			# Skip empty cells in the current layer
-			if self.tilemap.level_data[layer][y][x] == "-1":
-				empty_cells_layer += 1
-				continue
-			# Check if the current cell cannot be walked on
-			if not self.tilemap.tileset[ self.tilemap.level_data[layer][y][x] ].walkable:
-				return False
-
-		# How many empty cells are there in (x, y), if all layers have them then we can't walk on that tile
-		if empty_cells_layer == len(self.tilemap.layers):
+		# Map collisions: every cell under the hitbox must be walkable
+		if not self.tilemap.is_walkable_rect(new_hitbox):
 			return False
 
-		# TODO TMP Basic collision detection
-		others = [ item[1][0].rect for item in self.world.get_components(Hitbox) if item[1][0].rect != hitbox.rect ]
-		# Fake Broad phase
-		collision_indexes = new_hitbox.collidelistall(others)
-		if collision_indexes:
-			# Fake Narrow phase
-			if others[collision_indexes[0]].colliderect(new_hitbox):
-				return False
+		# Objects collisions
+		return not self.collides(entity, new_hitbox)
+
+	def step(self):
+		"""Advance the simulation by a single fixed step"""
+
+		# A PhysicsBody needs to have an AnimatedSprite and a Hitbox component too
+		# TODO Hitbox may be an optional requirement later on
+		bodies = self.world.get_components( AnimatedSprite, Hitbox, PhysicsBody )
+		if self.collisions_enabled: profiler.count( "physics.collision_probes", len(bodies) )
+
+		for ent, (sprite, hitbox, body) in bodies:
+
+			# Keep the current state for render interpolation
+			body.previous_position = body.position
 
-		return True
+			# Update velocity based on current movement direction (when available)
+			if body.direction.length() > 0:
+				# Normalize vector to guarantee that diagonal movement and linear movement have the same length
+				body.direction.normalize_ip()
+				# Apply acceleration: interpolate between current directional speed and body acceleration
+				velocity = body.velocity.lerp( body.direction * body.speed, body.acceleration )
+			else:
+				# Apply friction: interpolate between a zero-length vector and body friction
+				velocity = body.velocity.lerp( VECTOR_ZERO, body.friction )
+
+			# Update position based on current velocity
+			position = body.position + velocity
+
+			# Clamp hitbox sprite to world limits
+			self.clamp_vector2_ip( position, hitbox.rect.w/2, hitbox.rect.h/2 )
+
+			# Stop the current entity before colliding with an unwalkable tile or another physics-enabled entity
+			if self.collisions_enabled:
+				if not self.is_valid_position( ent, hitbox, position ):
+					"""
+						To implement a simple bounce effect we can simply do "velocity = -velocity"
+						A better approach may be to get the impulse strength and direction and
+						compute the correct bounce angle along with a realistic impulse force
+					"""
+					velocity = pygame.Vector2(0, 0)
+					position = body.position + velocity
+
+			# Update physic vectors
+			body.velocity = velocity
+			body.position = position
+			# Update sprites position
+			sprite.rect.center = body.position
+			hitbox.rect.center = ( body.position.x + hitbox.offset_x, body.position.y + hitbox.offset_y )
+			self.dynamic_hitboxes.move(ent, hitbox.rect)
+
+	def simulate(self, steps):
+		"""Run @steps fixed steps in a row"""
+		for _ in range(steps):
+			self.step()
+
+	def interpolate(self, alpha):
+		"""Move sprites between the previous and the current bodies positions, @alpha is the elapsed step fraction"""
+		for ent, (sprite, body) in self.world.get_components( AnimatedSprite, PhysicsBody ):
+			sprite.rect.center = body.previous_position.lerp( body.position, alpha )
 
 	@exectime
 	def process(self, dt):
+		"""Run a single fixed step, @dt is always 1 / rate (the scheduler handles catch-up steps)"""
 		# Get map component
 		if not self.tilemap:
 			self.tilemap = self.world.get_component(TileMap)[0][1]
 
-		# Update physics in multiple fixed steps
-		self.steps = 0
-		while pygame.time.get_ticks() > self.previous_ticks and self.steps < self.max_frameskip:
-
-			# A PhysicsBody needs to have an AnimatedSprite and a Hitbox component too
-			# TODO Hitbox may be an optional requirement later on
-			for ent, (sprite, hitbox, body) in self.world.get_components( AnimatedSprite, Hitbox, PhysicsBody ):
-
-				# Update velocity based on current movement direction (when available)
-				if body.direction.length() > 0:
-					# Normalize vector to guarantee that diagonal movement and linear movement have the same length
-					body.direction.normalize_ip()
-					# Apply acceleration: interpolate between current directional speed and body acceleration
-					velocity = body.velocity.lerp( body.direction * body.speed, body.acceleration )
-				else:
-					# Apply friction: interpolate between a zero-length vector and body friction
-					velocity = body.velocity.lerp( VECTOR_ZERO, body.friction )
-
-				# Update position based on current velocity
-				position = body.position + velocity
-
-				# Clamp hitbox sprite to world limits
-				self.clamp_vector2_ip( position, hitbox.rect.w/2, hitbox.rect.h/2 )
-
-				# Stop the current entity before colliding with an unwalkable tile or another physics-enabled entity
-				if self.collisions_enabled:
-					if not self.is_valid_position( hitbox, position ):
-						"""
-							To implement a simple bounce effect we can simply do "velocity = -velocity"
-							A better approach may be to get the impulse strength and direction and
-							compute the correct bounce angle along with a realistic impulse force
-						"""
-						velocity = pygame.Vector2(0, 0)
-						position = body.position + velocity
-
-				# Update physic vectors
-				body.velocity = velocity
-				body.position = position
-				# Update sprites position
-				sprite.rect.center = body.position
-				hitbox.rect.center = ( body.position.x + hitbox.offset_x, body.position.y + hitbox.offset_y )
-
-			# Simulation step completed
-			self.previous_ticks += self.step_ticks
-			self.steps += 1
+		# Broad phase grids, kept in sync by the component callbacks afterwards
+		if self.hitboxes is None: self.index_hitboxes()
+
+		self.simulate(1)
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class BatchedPhysicsSimulation(PhysicsSimulation):
+	"""Structure-of-arrays variant: integrate, clamp and test map collisions for all bodies at once with numpy"""
+
+	def __init__(self, bounding_rect):
+		super().__init__(bounding_rect)
+
+		# Simulated entities, in the same order as the arrays rows
+		self.entities 	= []
+		self.components = [] 	# (AnimatedSprite, Hitbox, PhysicsBody) for each entity
+
+		# Bodies state (one row per body)
+		self.previous_positions = numpy.zeros( (0, 2) )
+		self.positions 		= numpy.zeros( (0, 2) )
+		self.velocities 	= numpy.zeros( (0, 2) )
+		self.directions 	= numpy.zeros( (0, 2) )
+		self.speeds 		= numpy.zeros( 0 )
+		self.frictions 		= numpy.zeros( 0 )
+		self.accelerations 	= numpy.zeros( 0 )
+
+		# Hitboxes data (one row per body): width and height, offset from the body position
+		self.hitbox_sizes 	= numpy.zeros( (0, 2), dtype=numpy.int64 )
+		self.hitbox_offsets = numpy.zeros( (0, 2), dtype=numpy.int64 )
+
+	def sync_bodies(self):
+		"""Resize the arrays when bodies have been created or deleted"""
+		bodies = self.world.get_components( AnimatedSprite, Hitbox, PhysicsBody )
+		entities = [ ent for ent, _ in bodies ]
+		if entities == self.entities: return
+
+		count = len(bodies)
+		self.entities 	= entities
+		self.components = [ components for _, components in bodies ]
+
+		self.previous_positions = numpy.zeros( (count, 2) )
+		self.positions 		= numpy.zeros( (count, 2) )
+		self.velocities 	= numpy.zeros( (count, 2) )
+		self.directions 	= numpy.zeros( (count, 2) )
+		self.speeds 		= numpy.zeros( count )
+		self.frictions 		= numpy.zeros( count )
+		self.accelerations 	= numpy.zeros( count )
+		self.hitbox_sizes 	= numpy.zeros( (count, 2), dtype=numpy.int64 )
+		self.hitbox_offsets = numpy.zeros( (count, 2), dtype=numpy.int64 )
+
+	def gather(self):
+		"""Copy bodies state into the arrays (other systems are free to change bodies between frames)"""
+		for row, (sprite, hitbox, body) in enumerate(self.components):
+			self.previous_positions[row] = body.previous_position
+			self.positions[row] 		= body.position
+			self.velocities[row] 		= body.velocity
+			self.directions[row] 		= body.direction
+			self.speeds[row] 			= body.speed
+			self.frictions[row] 		= body.friction
+			self.accelerations[row] 	= body.acceleration
+			self.hitbox_sizes[row] 		= hitbox.rect.size
+			self.hitbox_offsets[row] 	= ( hitbox.offset_x, hitbox.offset_y )
+
+	def scatter(self):
+		"""Copy the arrays back into the bodies and update the related rects"""
+		directions = self.directions.tolist()
+		velocities = self.velocities.tolist()
+		positions = self.positions.tolist()
+		previous_positions = self.previous_positions.tolist()
+		for row, (sprite, hitbox, body) in enumerate(self.components):
+			body.previous_position = pygame.Vector2( previous_positions[row] )
+			body.direction 	= pygame.Vector2( directions[row] )
+			body.velocity 	= pygame.Vector2( velocities[row] )
+			body.position 	= pygame.Vector2( positions[row] )
+			# Update sprites position
+			sprite.rect.center = body.position
+			hitbox.rect.center = ( body.position.x + hitbox.offset_x, body.position.y + hitbox.offset_y )
+			self.dynamic_hitboxes.move( self.entities[row], hitbox.rect )
+
+	def step(self):
+		"""Advance all bodies by a single fixed step"""
+		if not self.entities: return
+		if self.collisions_enabled: profiler.count( "physics.collision_probes", len(self.entities) )
+
+		# Keep the current state for render interpolation
+		self.previous_positions = self.positions
+
+		# Normalize movement directions, bodies without a direction are slowed down by friction instead
+		lengths = numpy.hypot( self.directions[:, 0], self.directions[:, 1] )
+		moving = lengths > 0
+		self.directions[moving] /= lengths[moving, None]
+
+		# Interpolate between current velocity and the target one (directional speed or zero)
+		targets = numpy.where( moving[:, None], self.directions * self.speeds[:, None], 0.0 )
+		factors = numpy.where( moving, self.accelerations, self.frictions )
+		velocities = self.velocities + (targets - self.velocities) * factors[:, None]
+
+		# Update position based on current velocity, clamped to world limits
+		half_sizes = self.hitbox_sizes / 2
+		positions = self.positions + velocities
+		positions[:, 0] = numpy.round( numpy.minimum( self.max_x - half_sizes[:, 0], numpy.maximum( self.min_x + half_sizes[:, 0], positions[:, 0] ) ) )
+		positions[:, 1] = numpy.round( numpy.minimum( self.max_y - half_sizes[:, 1], numpy.maximum( self.min_y + half_sizes[:, 1], positions[:, 1] ) ) )
+
+		if self.collisions_enabled:
+			# Candidate hitboxes (same as is_valid_position: centered on the new position, then shrinked)
+			centers = positions.astype(numpy.int64) + self.hitbox_offsets
+			lefts = centers[:, 0] - self.hitbox_sizes[:, 0] // 2 + 8
+			tops = centers[:, 1] - self.hitbox_sizes[:, 1] // 2 + 8
+			widths = self.hitbox_sizes[:, 0] - 16
+			heights = self.hitbox_sizes[:, 1] - 16
+
+			# Map collisions for every body at once
+			valid = self.tilemap.walkable_rects( lefts, tops, lefts + widths, tops + heights )
+
+			# Objects collisions, in order: each moved hitbox is visible to the following bodies
+			rects = numpy.stack( (lefts, tops, widths, heights, centers[:, 0], centers[:, 1]), axis=1 ).tolist()
+			for row in numpy.flatnonzero(valid).tolist():
+				left, top, width, height, center_x, center_y = rects[row]
+				if self.collides( self.entities[row], pygame.Rect( left, top, width, height ) ):
+					valid[row] = False
+					continue
+				hitbox = self.components[row][1]
+				hitbox.rect.center = ( center_x, center_y )
+				self.dynamic_hitboxes.move( self.entities[row], hitbox.rect )
+
+			# Stop the bodies before colliding with an unwalkable tile or another physics-enabled entity
+			velocities[~valid] = 0.0
+			positions[~valid] = self.positions[~valid]
+
+		self.velocities = velocities
+		self.positions = positions
+
+	def simulate(self, steps):
+		"""Run @steps fixed steps in a row on the arrays, bodies are only read and written once"""
+		if not steps: return
+		self.sync_bodies()
+		self.gather()
+		for _ in range(steps):
+			self.step()
+		self.scatter()
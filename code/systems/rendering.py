@@ -1,35 +1,152 @@
+import numpy
 import pygame
-from esper import Processor, set_handler
+from esper import Processor
+from code.baking 			import TilesetPixels, chunk_baker
 from code.components.camera import CameraFollow
 from code.components.hitbox import Hitbox
 from code.components.map 	import TileMap
 from code.components.sprite import AnimatedSprite, StaticSprite
+from code.display 			import display_regions, merge_rects
+from code.map_format 		import TILE_EMPTY
+from code.spatial_hash 		import SpatialHash
 from code.settings import (
+	MAP_CHUNK_EVICTION_RADIUS,
+	MAP_CHUNK_SIZE,
+	RENDERING_DIRTY_MAX_AREA,
+	RENDERING_DIRTY_RECTS,
 	RENDERING_LAYERS,
 	TILE_SIZE,
 )
 from code.decorators import exectime
+from code.profiler import profiler
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class DrawList:
+	"""Persistent, per-layer and y-sorted list of the sprites inside the viewport
+
+	Sprites are indexed on their add/remove (see code.world.World.subscribe): StaticSprite never move and
+	stay in their grid, AnimatedSprite are moved in theirs when their rect changed. Each layer keeps last
+	frame's order for the sprites that did not move, the moved and new ones are sorted apart then merged in
+	(Timsort merges two sorted runs in linear time).
+	"""
+
+	def __init__(self, layers):
+		self.sprites 	= {} 	# entity => StaticSprite or AnimatedSprite
+		self.animated 	= {} 	# entity => AnimatedSprite (subset of sprites)
+		self.bounds 	= {} 	# entity => copy of the AnimatedSprite rect, as last indexed
+		self.static_index 	= SpatialHash()
+		self.dynamic_index 	= SpatialHash()
+
+		# Layer value => [ (entity, sprite) ] inside the viewport last frame, y-sorted
+		self.layers = { layer: [] for layer in layers }
+
+	def subscribe(self, world):
+		"""Track the sprites of @world, existing ones included"""
+		world.subscribe( StaticSprite, self.on_static_added, self.on_removed )
+		world.subscribe( AnimatedSprite, self.on_animated_added, self.on_removed )
+
+	def on_static_added(self, ent, sprite):
+		self.sprites[ent] = sprite
+		self.static_index.insert(ent, sprite.rect)
+
+	def on_animated_added(self, ent, sprite):
+		self.sprites[ent] = sprite
+		self.animated[ent] = sprite
+		self.bounds[ent] = sprite.rect.copy()
+		self.dynamic_index.insert(ent, sprite.rect)
+
+	def on_removed(self, ent, sprite):
+		if self.sprites.get(ent) is not sprite: return
+		del self.sprites[ent]
+		self.animated.pop(ent, None)
+		self.bounds.pop(ent, None)
+		self.static_index.remove(ent)
+		self.dynamic_index.remove(ent)
+
+	def update(self, view):
+		"""Cull sprites to @view (world rect) and y-sort each layer, returns the visible (entity, sprite) pairs"""
+		# Animated sprites move and may replace their rect (new animation frame)
+		moved = set()
+		bounds = self.bounds
+		for ent, sprite in self.animated.items():
+			if sprite.rect != bounds[ent]:
+				bounds[ent] = sprite.rect.copy()
+				self.dynamic_index.move(ent, sprite.rect)
+				moved.add(ent)
+
+		# Visible sprites, by layer: layer value => { entity: sprite }
+		sprites = self.sprites
+		visible = {}
+		for ent in self.static_index.query(view) | self.dynamic_index.query(view):
+			sprite = sprites[ent]
+			if sprite.rect.colliderect(view): visible.setdefault( sprite.layer, {} )[ent] = sprite
+
+		items = []
+		for layer, entries in self.layers.items():
+			bucket = visible.get( layer, {} )
+
+			# Keep last frame's order for sprites still in view that did not move
+			kept = []
+			for entry in entries:
+				if entry[0] not in moved and bucket.get(entry[0]) is entry[1]:
+					kept.append(entry)
+					del bucket[entry[0]]
+
+			# Merge the moved and new ones in
+			if bucket:
+				kept.extend( sorted( bucket.items(), key = _centery ) )
+				kept.sort( key = _centery )
+			self.layers[layer] = kept
+			items.extend(kept)
+		return items
+
+
+def _centery(entry):
+	"""Draw order of an (entity, sprite) entry"""
+	return entry[1].rect.centery
 
 
 # -------------------------------------------------------------------------------------------------
 
 
 class LayeredRendering(Processor):
-	"""A simple layered renderer (y-sorting, layered map caching, only draw elements inside view)"""
+	"""A simple layered renderer (y-sorting, chunked map caching, only draw elements inside view)
+
+	Everything is drawn straight to the display with the camera offset. While the camera stands still only
+	the areas of sprites that moved, changed frame, appeared or disappeared are redrawn and pushed to the
+	display (dirty rectangles), any other change (scrolling, debug frames, scene change) redraws the viewport.
+	"""
 
-	def __init__(self, scene_name, world_width, world_height):
+	def __init__(self, scene_name, world_width, world_height, dirty_rects = RENDERING_DIRTY_RECTS):
 		# World identifier
 		self.scene_name = scene_name
-		# Get a reference to the active display
+		# Get a reference to the active display, the viewport-sized rendering target
 		self.screen 	= pygame.display.get_surface()
 
-		# Black surface to clear the screen
-		self.background = pygame.Surface( (world_width, world_height) ).convert()
-		# Working canvas for sprite rendering
-		self.canvas 	= pygame.Surface( (world_width, world_height) ).convert()
+		# World boundaries
+		self.world_width 	= world_width
+		self.world_height 	= world_height
 
-		# A canvas dictionary for map layers surfaces to avoid unnecessary blits
-		self.map_canvases = {}
+		# Sprites inside the viewport, one y-sorted list per layer
+		self.draw_list 		= DrawList( RENDERING_LAYERS.values() )
+
+		# Dirty rectangles tracking: entity => (world rect, image, layer) of the sprites drawn last frame
+		self.dirty_rects 	= dirty_rects
+		self.drawn 			= {}
+		self.drawn_camera 	= None 	# Camera position of the last frame
+
+		# Map layers surfaces, split in chunks to avoid unnecessary blits and world-sized surfaces:
+		# layer name => { (chunk_x, chunk_y): pygame.Surface or None for empty chunks }
+		self.map_chunks = {}
+		# Tileset pixels the chunks are baked from (debug frames included when debugging)
+		self.tile_pixels = None
+		# Chunks baked off-frame (see code.baking.ChunkBaker): (layer name, chunk_x, chunk_y) => BakeJob
+		self.pending_chunks = {}
+		# Chunk size in pixels
+		self.chunk_size = MAP_CHUNK_SIZE * TILE_SIZE
 
 		# Viewport component reference
 		self.camera 	= None
@@ -38,34 +155,177 @@ class LayeredRendering(Processor):
 
 		# Flags
 		self.debug 		= False # Activate debug rectangles (sprite, hitbox)
-		self.redraw_map = True 	# Update the working canvas
+		self.redraw_map = True 	# Drop the baked map chunks
+		self.redraw_all = True 	# Draw the whole viewport on the next frame
 
-		# Event handlers
-		set_handler( "scene_change", self.on_scene_change )
-		set_handler( "toggle_debug", self.on_toggle_debug )
+	def register_handlers(self, events):
+		"""Subscribe to the world event bus"""
+		events.subscribe( "scene_change", self.on_scene_change )
+		events.subscribe( "toggle_debug", self.on_toggle_debug )
 
 	def on_scene_change(self, name):
 		"""Notify the need to update this menu UI"""
-		if name == self.scene_name: self.redraw_map = True
+		if name == self.scene_name:
+			self.redraw_map = True
+			self.redraw_all = True
 
 	def on_toggle_debug(self, value):
 		"""Toggle debug routines"""
 		self.debug = value
 		self.redraw_map = True
+		self.redraw_all = True
 
 	def init_static_map_surfaces(self):
-		"""Create one surface for each map layer, to hold static elements until the next change"""
+		"""Reset the chunks cache of each map layer, chunks are baked again the next time they are in view"""
 		if not self.tilemap: return
 
-		self.map_canvases = {}
+		self.map_chunks = {}
+		self.tile_pixels = TilesetPixels( self.tilemap.tileset, self.debug )
+		for job in self.pending_chunks.values(): job.discard()
+		self.pending_chunks = {}
 		for layer in self.tilemap.layers:
 			# Skip main layer because its elements are rendered as sprites
 			if layer == "main": continue
-			# Create a surface for each layer with per-pixel alpha to enable layered rendering
-			self.map_canvases[layer] = pygame.Surface(
-				( self.tilemap.world_width, self.tilemap.world_height ),
-				flags = pygame.SRCALPHA
-			).convert_alpha()
+			self.map_chunks[layer] = {}
+
+	def visible_chunks(self, rect = None):
+		"""Chunks range (min_x, min_y, max_x, max_y) intersecting @rect (world coordinates, defaults to the camera viewport), bounds included"""
+		rect = rect or self.camera.rect
+		return (
+			rect.left // self.chunk_size,
+			rect.top // self.chunk_size,
+			(rect.right - 1) // self.chunk_size,
+			(rect.bottom - 1) // self.chunk_size
+		)
+
+	def chunk_cells(self, layer_name, chunk_x, chunk_y):
+		"""Tile ids of a single map chunk, clipped to map boundaries"""
+		min_col = chunk_x * MAP_CHUNK_SIZE
+		min_row = chunk_y * MAP_CHUNK_SIZE
+		max_col = min( min_col + MAP_CHUNK_SIZE, self.tilemap.map_width )
+		max_row = min( min_row + MAP_CHUNK_SIZE, self.tilemap.map_height )
+		return self.tilemap.level_data[layer_name][min_row:max_row, min_col:max_col]
+
+	def bake_chunks(self, keys):
+		"""Render the tiles of several (layer name, chunk_x, chunk_y) chunks in a single batch (see code.baking.ChunkBaker)
+
+		Returns one surface per chunk, None for chunks without tiles.
+		"""
+		grids = [ self.chunk_cells(*key) for key in keys ]
+		for cells in grids:
+			profiler.count( "rendering.tiles_baked", int( numpy.count_nonzero( cells != TILE_EMPTY ) ) )
+		return chunk_baker.bake_many( self.tile_pixels, grids )
+
+	def bake_visible_chunks(self, visible):
+		"""Bake the @visible chunks missing from every map layer, off-frame when the bake pool is available
+
+		Chunks baked off-frame are empty until their job is done, then the viewport is redrawn.
+		"""
+		# Chunks baked by the worker processes since the previous frame
+		for key, job in list( self.pending_chunks.items() ):
+			if not job.done(): continue
+			del self.pending_chunks[key]
+			self.map_chunks[key[0]][key[1:]] = job.result()
+			self.redraw_all = True
+
+		missing = [
+			(layer_name, chunk_x, chunk_y)
+			for layer_name, chunks in self.map_chunks.items()
+			for chunk_y in range(visible[1], visible[3] + 1)
+			for chunk_x in range(visible[0], visible[2] + 1)
+			if (chunk_x, chunk_y) not in chunks
+		]
+		if not missing: return
+
+		if chunk_baker.parallel(self.tile_pixels):
+			for key in missing:
+				cells = self.chunk_cells(*key)
+				profiler.count( "rendering.tiles_baked", int( numpy.count_nonzero( cells != TILE_EMPTY ) ) )
+				job = chunk_baker.submit( self.tile_pixels, cells )
+				if job: self.pending_chunks[key] = job
+				# Nothing to draw meanwhile
+				self.map_chunks[key[0]][key[1:]] = None
+			return
+
+		for (layer_name, chunk_x, chunk_y), surface in zip( missing, self.bake_chunks(missing) ):
+			self.map_chunks[layer_name][(chunk_x, chunk_y)] = surface
+
+	def evict_chunks(self, visible):
+		"""Drop baked chunks too far away from the @visible chunks range"""
+		min_x = visible[0] - MAP_CHUNK_EVICTION_RADIUS
+		min_y = visible[1] - MAP_CHUNK_EVICTION_RADIUS
+		max_x = visible[2] + MAP_CHUNK_EVICTION_RADIUS
+		max_y = visible[3] + MAP_CHUNK_EVICTION_RADIUS
+
+		for chunks in self.map_chunks.values():
+			far_away = [ key for key in chunks if not (min_x <= key[0] <= max_x and min_y <= key[1] <= max_y) ]
+			for key in far_away:
+				del chunks[key]
+
+		far_away = [ key for key in self.pending_chunks if not (min_x <= key[1] <= max_x and min_y <= key[2] <= max_y) ]
+		for key in far_away:
+			self.pending_chunks.pop(key).discard()
+
+	def draw_map_layer(self, layer_name, visible):
+		"""Blit the @visible chunks of a map layer, baking the missing ones. Returns the blits count"""
+		chunks = self.map_chunks[layer_name]
+		offset_x = self.camera.rect.x
+		offset_y = self.camera.rect.y
+
+		blits = 0
+		for chunk_y in range(visible[1], visible[3] + 1):
+			for chunk_x in range(visible[0], visible[2] + 1):
+				# Bake chunks on their first appearance (usually done by bake_visible_chunks already)
+				if (chunk_x, chunk_y) not in chunks:
+					chunks[(chunk_x, chunk_y)] = self.bake_chunks( [ (layer_name, chunk_x, chunk_y) ] )[0]
+				surface = chunks[(chunk_x, chunk_y)]
+				# Nothing to draw
+				if not surface: continue
+				self.screen.blit( surface, (chunk_x * self.chunk_size - offset_x, chunk_y * self.chunk_size - offset_y) )
+				blits += 1
+		return blits
+
+	def draw_region(self, area):
+		"""Draw map layers and the draw list sprites inside @area (world coordinates), returns the blits count"""
+		offset = ( -self.camera.rect.x, -self.camera.rect.y )
+		chunks = self.visible_chunks(area)
+
+		blits = 0
+		for layer_name, layer_value in RENDERING_LAYERS.items():
+
+			# Draw map layers, except for the "main" one (map elements on that layer are implemented as StaticSprite)
+			if layer_name in self.map_chunks:
+				blits += self.draw_map_layer(layer_name, chunks)
+
+			# Draw the current layer of sprites
+			for ent, sprite in self.draw_list.layers[layer_value]:
+				if sprite.rect.colliderect(area):
+					self.screen.blit(sprite.image, sprite.rect.move(offset))
+					blits += 1
+					# Render debug frames
+					if self.debug:
+						# Sprite surface
+						pygame.draw.rect( self.screen, sprite.debug_color, sprite.rect.move(offset), width = 2 )
+						# Related hitbox (when available)
+						hitbox = self.world.try_component( ent, Hitbox )
+						if hitbox:
+							pygame.draw.rect( self.screen, hitbox.debug_color, hitbox.rect.move(offset), width = 2 )
+		return blits
+
+	def changed_areas(self, sprites):
+		"""World areas to redraw since the last frame: old and new rects of moved, animated, spawned or deleted @sprites"""
+		areas = []
+		previous = self.drawn
+		for ent, sprite in sprites:
+			state = previous.pop(ent, None)
+			if state is None:
+				areas.append( sprite.rect )
+			elif state[1] is not sprite.image or state[2] != sprite.layer or state[0] != sprite.rect:
+				areas.append( state[0] )
+				areas.append( sprite.rect )
+		# Sprites deleted or out of view
+		areas.extend( state[0] for state in previous.values() )
+		return areas
 
 	@exectime
 	def process(self, dt):
@@ -77,66 +337,56 @@ class LayeredRendering(Processor):
 		if not self.tilemap:
 			self.tilemap = self.world.get_component(TileMap)[0][1]
 			self.init_static_map_surfaces()
+			self.draw_list.subscribe(self.world)
 
-		# Clear the screen
-		self.canvas.blit(self.background, (0, 0))
+		# Rebuild map chunks from scratch
+		if self.redraw_map:
+			self.init_static_map_surfaces()
+			self.redraw_map = False
+
+		# Map chunks in view, everything else gets evicted
+		visible = self.visible_chunks()
+		self.evict_chunks(visible)
+		self.bake_visible_chunks(visible)
 
-		# Combine Static and Animated sprites for rendering
-		y_sorted_sprites = sorted(
-			self.world.get_component( StaticSprite ) + self.world.get_component( AnimatedSprite ),
-			key = lambda sprite: sprite[1].rect.centery
+		# Static and Animated sprites inside the viewport
+		visible_sprites = self.draw_list.update(self.camera.rect)
+
+		# Anything else than sprites changes requires a full redraw
+		redraw_all = (
+			self.redraw_all
+			or not self.dirty_rects
+			or self.debug
+			or self.drawn_camera != self.camera.rect.topleft
 		)
 
-		# Build the working canvas
-		for layer_name, layer_value in RENDERING_LAYERS.items():
+		# Changed areas only, unless they cover most of the viewport
+		if not redraw_all:
+			screen_rect = self.screen.get_rect()
+			offset = ( -self.camera.rect.x, -self.camera.rect.y )
+			dirty = [ rect.move(offset).clip(screen_rect) for rect in merge_rects( self.changed_areas(visible_sprites) ) ]
+			dirty = [ rect for rect in dirty if rect.w and rect.h ]
+			redraw_all = sum( rect.w * rect.h for rect in dirty ) > screen_rect.w * screen_rect.h * RENDERING_DIRTY_MAX_AREA
 
-			# Draw map layers, except for the "main" one (map elements on that layer are implemented as StaticSprite)
-			if layer_name != "main" and layer_name in self.tilemap.layers:
-
-				# Rebuild this layer's static map
-				if self.redraw_map:
-					# Iterate tiles and draw them
-					cell_value = None
-					for row in range(self.tilemap.map_height):
-						for col in range(self.tilemap.map_width):
-							cell_value = self.tilemap.level_data[layer_name][row][col]
-							# Skip empty cells
-							if cell_value == "-1": continue
-							# Map grid position to world position
-							tile_rect = pygame.Rect( col * TILE_SIZE, row * TILE_SIZE, TILE_SIZE, TILE_SIZE )
-
-							# Render cell
-							self.map_canvases[layer_name].blit( self.tilemap.tileset[cell_value].image, tile_rect )
-							# Render debug frames
-							if self.debug:
-								pygame.draw.rect(
-									self.map_canvases[layer_name],
-									self.tilemap.tileset[cell_value].debug_color,
-									tile_rect,
-									width = 1
-								)
-
-				# Render this layer's static map
-				self.canvas.blit( self.map_canvases[layer_name], (0, 0) )
-
-			# Draw sprites
-			for ent, sprite in y_sorted_sprites:
-				# Skip out-of-view elements
-				if sprite.rect.clip(self.camera.rect).size == (0, 0): continue
-				# Render the current layer of sprites
-				if sprite.layer == layer_value:
-					self.canvas.blit(sprite.image, sprite.rect)
-					# Render debug frames
-					if self.debug:
-						# Sprite surface
-						pygame.draw.rect( self.canvas, sprite.debug_color, sprite.rect, width = 2 )
-						# Related hitbox (when available)
-						hitbox = self.world.try_component( ent, Hitbox )
-						if hitbox:
-							pygame.draw.rect( self.canvas, hitbox.debug_color, hitbox.rect, width = 2 )
+		blits = 0
+		if redraw_all:
+			self.screen.fill( (0, 0, 0) )
+			blits += self.draw_region( self.camera.rect )
+			display_regions.invalidate()
+			self.redraw_all = False
+		else:
+			for rect in dirty:
+				self.screen.set_clip(rect)
+				self.screen.fill( (0, 0, 0), rect )
+				blits += self.draw_region( rect.move(self.camera.rect.topleft) )
+			self.screen.set_clip(None)
+			display_regions.add(dirty)
+			profiler.count( "rendering.dirty_rects", len(dirty) )
 
-		# Stop map surfaces construction once done
-		if self.redraw_map: self.redraw_map = False
+		# What is on screen now
+		self.drawn = { ent: ( sprite.rect.copy(), sprite.image, sprite.layer ) for ent, sprite in visible_sprites }
+		self.drawn_camera = self.camera.rect.topleft
 
-		# Blit everything to the screen
-		self.screen.blit(self.canvas, (0, 0), self.camera.rect)
+		# Hot path stats
+		profiler.count( "rendering.blits", blits )
+		profiler.count( "rendering.sprites_culled", len(self.draw_list.sprites) - len(visible_sprites) )
@@ -1,6 +1,8 @@
 import esper
 import pygame
-from code.components.ui import UiButton, UiCursor, UiImage, UiItem, UiSurface, UiText
+from code.display import display_regions
+from code.input import input_state
+from code.components.ui import UiButton, UiCursor, UiImage, UiItem, UiProgress, UiSurface, UiText
 
 
 # -------------------------------------------------------------------------------------------------
@@ -29,17 +31,18 @@ class MenuInputHandler(esper.Processor):
 			self.cursor = self.world.component_for_entity(self.cursor_entity, UiCursor)
 
 		# Get current mouse position
-		mouse_pos = pygame.mouse.get_pos()
+		mouse_pos = input_state.mouse_position
 		# Set the cursor sprite position to follow the mouse position
 		self.cursor.rect.center = mouse_pos
 
+		# Clicks fire once, on the frame the button goes down
+		clicked = input_state.was_pressed("select")
+
 		# Process user input like mouse movement and clicks
 		collision = None
-		mouse_left = None
 		for ent, (button, item) in self.world.get_components(UiButton, UiItem):
 
 			collision = item.rect.collidepoint(mouse_pos)
-			mouse_left, _, __ = pygame.mouse.get_pressed()
 
 			# Check button state for hovering effect (only on buttons with no image surfaces)
 			if (
@@ -47,12 +50,11 @@ class MenuInputHandler(esper.Processor):
 				(not button.hovering and collision) or
 				(button.hovering and not collision)
 			):
-				button.hovering = not button.hovering 			# Update button state
-				# TODO Maybe we should use a more "clear" function like "set_redraw(True)"
-				self.rendering.on_scene_change(self.scene_name) # Force current scene re-rendering
+				button.hovering = not button.hovering 	# Update button state
+				self.rendering.redraw_area(button.rect) # Re-render this button only
 
 			# Check collision and user input to activate callback
-			if collision and mouse_left:
+			if collision and clicked:
 				item.callback()
 
 
@@ -60,7 +62,13 @@ class MenuInputHandler(esper.Processor):
 
 
 class MenuRendering(esper.Processor):
-	"""Build the menu using a custom layered rendering system"""
+	"""Build the menu using a custom layered rendering system
+
+	The menu is rendered once on a static surface, each frame only the changed areas (the cursor old and new
+	rects, re-rendered buttons) are copied to the screen and reported to display_regions. A scene change
+	redraws and refreshes the whole screen, so does every frame while debugging (the profiler overlay is drawn
+	over the menu by the GameManager).
+	"""
 
 	def __init__(self, scene_name):
 		# World ID
@@ -70,15 +78,42 @@ class MenuRendering(esper.Processor):
 		self.surface = pygame.Surface(self.screen.get_size())
 		# Flag indicating that we need to render the menu again
 		self.redraw_ui = True
-		# Register an event handler for when there's been a scene change and we need to render the menu
-		esper.set_handler("scene_change", self.on_scene_change)
+		# Static surface areas re-rendered since the previous frame
+		self.changed = []
+		# Screen areas covered by dynamic entities on the previous frame
+		self.drawn = []
+		# Debugging: the whole screen is restored every frame
+		self.debug = False
+
+	def register_handlers(self, events):
+		"""Subscribe to the world event bus: a scene change means that we need to render the menu"""
+		events.subscribe("scene_change", self.on_scene_change)
+		events.subscribe("toggle_debug", self.on_toggle_debug)
 
 	def on_scene_change(self, name):
 		"""Notify the need to update this menu UI"""
 		if name == self.scene_name: self.redraw_ui = True
 
+	def on_toggle_debug(self, value):
+		"""Toggle debug routines"""
+		self.debug = value
+		self.redraw_ui = True
+
+	def redraw_area(self, rect):
+		"""Render the menu again within @rect only (e.g. a button whose state changed)"""
+		rect = pygame.Rect(rect)
+		self.surface.set_clip(rect)
+		self.render()
+		self.surface.set_clip(None)
+		self.changed.append(rect)
+
 	def reset(self):
 		self.redraw_ui = False
+		self.changed.clear()
+		self.render()
+
+	def render(self):
+		"""Render the static layers on the menu surface (within its clip area)"""
 
 		# Layer 0: plain surfaces (background)
 		for ent, surface in self.world.get_component(UiSurface):
@@ -102,12 +137,45 @@ class MenuRendering(esper.Processor):
 			self.surface.blit(text.surface, text.rect)
 
 	def process(self, dt):
-		# Render the menu
-		if self.redraw_ui: self.reset()
-
-		# Clear the screen with the static menu surface
-		self.screen.blit(self.surface, (0, 0))
+		if self.redraw_ui:
+			# Render the menu and clear the whole screen with it
+			self.reset()
+			self.screen.blit(self.surface, (0, 0))
+			display_regions.invalidate()
+			dirty = []
+		else:
+			# Restore the static menu where the screen changed (everywhere when debugging)
+			dirty = [ self.screen.get_rect() ] if self.debug else self.changed + self.drawn
+			self.changed = []
+			for rect in dirty:
+				self.screen.blit(self.surface, rect, rect)
 
 		# Blit dynamic entities
+		self.drawn = []
 		for ent, cursor in self.world.get_component(UiCursor):
-			self.screen.blit(cursor.image, cursor.rect)
+			self.drawn.append( self.screen.blit(cursor.image, cursor.rect) )
+
+		display_regions.add( dirty + self.drawn )
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class LoadingRendering(MenuRendering):
+	"""Static menu with progress bars on top, updated by "loading_progress" events (see WorldManager.load)"""
+
+	def register_handlers(self, events):
+		super().register_handlers(events)
+		events.subscribe("loading_progress", self.on_loading_progress)
+
+	def on_loading_progress(self, value):
+		for ent, bar in self.world.get_component(UiProgress):
+			bar.value = value
+
+	def process(self, dt):
+		super().process(dt)
+
+		for ent, bar in self.world.get_component(UiProgress):
+			pygame.draw.rect(self.screen, bar.background_color, bar.rect)
+			pygame.draw.rect(self.screen, bar.color, ( bar.rect.x, bar.rect.y, int(bar.rect.w * bar.value), bar.rect.h ))
+			display_regions.add( [bar.rect] )
@@ -0,0 +1,93 @@
+import pygame
+from code.assets import SurfaceCache
+from code.settings import TEXT_CACHE_BUDGET, TEXT_FONT
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class TextCache:
+	"""Process-wide Font objects by (name, size) and rendered text surfaces, the latter in a LRU cache
+
+	Font resolution (SysFont) may scan the system fonts, it happens once per (name, size). Cached surfaces must
+	be treated as read-only.
+	"""
+
+	def __init__(self, budget = TEXT_CACHE_BUDGET):
+		self.fonts 		= {} 	# (font name, size) => pygame.font.Font
+		self.surfaces 	= SurfaceCache(budget) 	# (text, size, color, antialias, font name) => pygame.Surface
+
+	def font(self, size, name = TEXT_FONT):
+		font = self.fonts.get( (name, size) )
+		if font is None:
+			font = self.fonts[ (name, size) ] = pygame.font.SysFont(name, size)
+		return font
+
+	def size(self, text, size, name = TEXT_FONT):
+		"""Size of @text once rendered, without rendering it"""
+		return self.font(size, name).size(text)
+
+	def render(self, text, size, color, antialias = True, name = TEXT_FONT):
+		"""Surface of @text, rendered on the first request only"""
+		key = ( text, size, tuple(color), antialias, name )
+		surface = self.surfaces.get(key)
+		if surface is None:
+			surface = self.surfaces.put( key, self.font(size, name).render(text, antialias, color) )
+		return surface
+
+	def clear(self):
+		self.fonts.clear()
+		self.surfaces.clear()
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class GlyphAtlas:
+	"""Strings composed from cached glyph surfaces, for text changing every frame (counters, HUD numbers)
+
+	Glyphs are rendered once per character, composing a string is a single blits() call instead of a
+	Font.render call and a new surface. It pays off for short strings in large fonts (HUD numbers), long
+	lines in small fonts render faster with Font.render. Kerning is ignored, static text belongs to TextCache.
+	"""
+
+	def __init__(self, size, color, antialias = True, name = TEXT_FONT):
+		self.font 		= text_cache.font(size, name)
+		self.color 		= color
+		self.antialias 	= antialias
+		self.height 	= self.font.get_height()
+		self.glyphs 	= {} 	# character => (pygame.Surface, advance)
+
+	def glyph(self, char):
+		glyph = self.glyphs.get(char)
+		if glyph is None:
+			surface = self.font.render(char, self.antialias, self.color)
+			glyph = self.glyphs[char] = ( surface, surface.get_width() )
+		return glyph
+
+	def size(self, text):
+		return ( sum( self.glyph(char)[1] for char in text ), self.height )
+
+	def draw(self, target, text, position):
+		"""Blit @text on @target with its top left corner at @position, returns the covered rect"""
+		x, y = position
+		sequence = []
+		for char in text:
+			surface, advance = self.glyph(char)
+			sequence.append( (surface, (x, y)) )
+			x += advance
+		target.blits( sequence, doreturn = False )
+		return pygame.Rect( position[0], y, x - position[0], self.height )
+
+	def render(self, text):
+		"""@text on a new transparent surface"""
+		surface = pygame.Surface( self.size(text), flags = pygame.SRCALPHA )
+		self.draw( surface, text, (0, 0) )
+		return surface
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+# Shared by every world and overlay
+text_cache = TextCache()
@@ -1,34 +1,126 @@
-from pygame.time import get_ticks
+from code.settings import TIMER_WHEEL_LEVELS, TIMER_WHEEL_SLOTS
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class TimingWheel:
+    """Hierarchical timing wheel: O(1) schedule and cancel, expired callbacks run in a single batch per advance
+
+    Time is counted in integer ticks (milliseconds of code.clock.frame_clock). Level 0 has one slot per tick,
+    each slot of level N covers a full turn of level N - 1: when a lower wheel wraps around, the next slot of
+    the upper one is cascaded down. Cancelled entries are skipped when their slot expires (lazy deletion).
+    """
+
+    def __init__(self, slots=TIMER_WHEEL_SLOTS, levels=TIMER_WHEEL_LEVELS):
+        self.slots = slots
+        self.levels = levels
+        self.now = 0            # Current tick
+        self.pending = 0        # Scheduled entries, cancelled ones included until they expire
+        # level => slot => [ (expiry tick, timer, generation) ]
+        self.wheels = [ [ [] for _ in range(slots) ] for _ in range(levels) ]
+
+    def clear(self):
+        """Drop every scheduled timer (e.g. when the worlds owning them are torn down)"""
+        for wheel in self.wheels:
+            for slot in wheel: slot.clear()
+        self.pending = 0
+
+    def schedule(self, timer, delay):
+        """Expire @timer (see Timer.expire) @delay ticks from now"""
+        self.pending += 1
+        self._insert( (self.now + max(1, int(delay)), timer, timer.generation) )
+
+    def _insert(self, entry):
+        """Place @entry in the lowest level whose turn covers its expiry tick"""
+        expires = entry[0]
+        delta = expires - self.now
+        width = 1       # Ticks per slot of the current level
+        for level in range(self.levels):
+            if delta < width * self.slots:
+                self.wheels[level][ (expires // width) % self.slots ].append(entry)
+                return
+            width *= self.slots
+
+        # Beyond the last level: parked in the top slot cascaded last, placed again by that cascade
+        width //= self.slots
+        self.wheels[-1][ (self.now // width - 1) % self.slots ].append(entry)
+
+    def advance(self, now):
+        """Move the wheel to tick @now, then expire the timers that are due, returns how many expired"""
+        expired = []
+        while self.now < now:
+            self.now += 1
+
+            # Upper wheels slots starting at this tick are cascaded down, from the highest one
+            level = 0
+            width = 1
+            while level + 1 < self.levels and self.now % (width * self.slots) == 0:
+                level += 1
+                width *= self.slots
+            while level:
+                slot = self.wheels[level][ (self.now // width) % self.slots ]
+                entries = slot[:]
+                slot.clear()
+                for entry in entries: self._insert(entry)
+                level -= 1
+                width //= self.slots
+
+            slot = self.wheels[0][ self.now % self.slots ]
+            if slot:
+                expired.extend(slot)
+                slot.clear()
+
+        # Batched callbacks, cancelled or restarted timers are skipped
+        self.pending -= len(expired)
+        count = 0
+        for _, timer, generation in expired:
+            if timer.generation == generation:
+                timer.expire()
+                count += 1
+        return count
 
 
 # -------------------------------------------------------------------------------------------------
 
 
 class Timer():
-    """Custom pygame timer. Slightly modified version of ClearCode Sproutland tutorial code (yt)"""
+    """Custom pygame timer. Slightly modified version of ClearCode Sproutland tutorial code (yt)
+
+    Scheduled on the shared timing wheel: nothing to poll, the timer turns inactive (and calls @callback) once
+    its duration of game time has elapsed. Paused or scaled frame clocks pause or scale timers too.
+    """
+
+    __slots__ = ("duration", "callback", "generation", "_active")
 
     def __init__(self, duration, callback=None):
         self.duration = duration
         self.callback = callback
-        self.start_time = 0
+        self.generation = 0     # Incremented on every (re)activation and cancellation
         self._active = False
 
     @property
     def active(self):
         return self._active
 
-    def activate(self):
+    def activate(self, duration=None):
+        """Start (or restart) the timer, for @duration milliseconds when given"""
+        self.generation += 1
         self._active = True
-        self.start_time = get_ticks()
+        timer_wheel.schedule( self, self.duration if duration is None else duration )
 
     def deactivate(self):
+        self.generation += 1
+        self._active = False
+
+    def expire(self):
+        """Called by the timing wheel once the duration has elapsed"""
         self._active = False
-        self.start_time = 0
-
-    def update(self):
-        if not self._active: return
-        current_time = get_ticks()
-        if current_time - self.start_time >= self.duration:
-            if self.callback and self.start_time != 0:
-                self.callback()
-            self.deactivate()
+        if self.callback: self.callback()
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+# Shared by every timer, advanced once per frame by the GameManager
+timer_wheel = TimingWheel()
@@ -1,55 +1,116 @@
 import os
+import random
 import pygame
+from code.assets import surface_cache
+from code.atlas import atlas
 from code.settings import GRAPHICS_FOLDER
 
 
+# Shared random generator for gameplay code (npcs, effects), seed it to get repeatable runs
+rng = random.Random()
+
+# Relative folder path => sorted image paths, avoids walking the same folders over and over
+_folder_listings = {}
+
+# Image path => surface decoded ahead of time (see decode_images), converted on its first load
+_decoded_images = {}
+
+
 # -------------------------------------------------------------------------------------------------
 
 
-def import_folder(path, size):
-	"""Load all images in the given @path. Slightly modified version of ClearCode Sproutland tutorial code (yt)"""
+def list_folder(path):
+	"""List all image paths in the given @path (and its subfolders), relative to GRAPHICS_FOLDER"""
+
+	if path in _folder_listings:
+		return _folder_listings[path]
 
-	# Loaded images
-	surfaces = []
+	# Packed folders are listed by the atlas index, loose files are never walked
+	listing = atlas.listing(path)
+	if listing is None: listing = walk_folder(path)
+
+	_folder_listings[path] = listing
+	return listing
+
+
+def walk_folder(path, graphics=GRAPHICS_FOLDER):
+	"""List the files in @path (and its subfolders) on disk, relative to @graphics"""
+
+	# Image paths found in @path
+	listing = []
 
 	# Os walk iterator, holds the folder contents and eventual subfolders
-	iterator = os.walk( os.path.join( GRAPHICS_FOLDER, path ) )
+	iterator = os.walk( os.path.join( graphics, path ) )
 
 	# For each subfolder in @path
 	for current_path, folders, files in iterator:
 
 		# For each file in the current folder, sorted by name
+		folder = os.path.relpath( current_path, graphics )
 		for image in sorted(files):
+			listing.append( image if folder == os.curdir else os.path.join( folder, image ) )
 
-			# Load the current file or load and scale when @size is present
-			image_path = os.path.join( path, image )
-			if size: 	image_surf = load_scaled_image( image_path, size )
-			else: 		image_surf = load_image( image_path )
+	return listing
 
-			surfaces.append(image_surf)
 
-	return surfaces
+# -------------------------------------------------------------------------------------------------
+
+
+def import_folder(path, size):
+	"""Load all images in the given @path. Slightly modified version of ClearCode Sproutland tutorial code (yt)"""
+
+	# Load each file or load and scale when @size is present
+	if size: 	return [ load_scaled_image( image_path, size ) for image_path in list_folder(path) ]
+	else: 		return [ load_image( image_path ) for image_path in list_folder(path) ]
 
 
 # -------------------------------------------------------------------------------------------------
 
 
-def load_image(name):
-	"""Load image and return image object"""
+def load_image(name, alpha=True):
+	"""Load image and return image object (shared through the asset cache, do not modify it)"""
+	# Packed images are subsurfaces of an atlas page
+	if alpha:
+		image = atlas.get(name)
+		if image is not None: return image
+
+	key = (name, None, alpha)
+
+	# Already decoded
+	image = surface_cache.get(key)
+	if image is not None: return image
+
 	fullname = os.path.join(GRAPHICS_FOLDER, name)
 	try:
-		image = pygame.image.load(fullname)
-		if image.get_alpha is None: image = image.convert()
-		else:                       image = image.convert_alpha()
+		image = _decoded_images.pop(name, None) or pygame.image.load(fullname)
+		if alpha: 	image = image.convert_alpha()
+		else: 		image = image.convert()
 	except pygame.error as message:
 		print('Cannot load image: {}'.format(fullname))
 		raise SystemExit(message)
-	return image
+	return surface_cache.put(key, image)
 
 
 # -------------------------------------------------------------------------------------------------
 
 
-def load_scaled_image(name, size):
-	"""Load image and return scaled image object. Size is a tuple"""
-	return pygame.transform.scale(load_image(name), size)
+def decode_images(names):
+	"""Read and decode images ahead of their first load, without display calls (safe on worker threads)"""
+	for name in names:
+		if name in _decoded_images or (name, None, True) in surface_cache or atlas.decode(name): continue
+		_decoded_images[name] = pygame.image.load( os.path.join(GRAPHICS_FOLDER, name) )
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+def load_scaled_image(name, size, alpha=True):
+	"""Load image and return scaled image object. Size is a tuple (shared through the asset cache)"""
+	size = ( int(size[0]), int(size[1]) )
+	key = (name, size, alpha)
+
+	# Already scaled to @size
+	image = surface_cache.get(key)
+	if image is not None: return image
+
+	return surface_cache.put( key, pygame.transform.scale(load_image(name, alpha), size) )
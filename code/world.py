@@ -0,0 +1,77 @@
+import esper
+from code.events import EventBus
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class World(esper.World):
+	"""An esper.World with its own event bus, notifying components additions and removals to its subscribers
+
+	Processors with a register_handlers(events) method subscribe to the world bus when added, their handlers
+	are dropped with the world (see WorldManager). Component callbacks receive (entity, component). Deferred
+	entity deletions are notified when the world finalizes them (at the beginning of the next process call),
+	replaced components are notified as removed then added.
+	"""
+
+	def __init__(self, timed = False):
+		super().__init__(timed)
+		# Component type => [ (on_added, on_removed) ]
+		self._listeners = {}
+		# World-scoped events
+		self.events = EventBus()
+
+	def add_processor(self, processor_instance, priority = 0):
+		super().add_processor(processor_instance, priority)
+		if hasattr(processor_instance, "register_handlers"):
+			processor_instance.register_handlers(self.events)
+
+	def subscribe(self, component_type, on_added = None, on_removed = None):
+		"""Call @on_added / @on_removed on every @component_type change, @on_added is also called for existing components"""
+		self._listeners.setdefault( component_type, [] ).append( (on_added, on_removed) )
+		if on_added:
+			for ent, component in self.get_component(component_type):
+				on_added(ent, component)
+
+	def _notify(self, entity, component_type, component, added):
+		for listener in self._listeners.get(component_type, ()):
+			callback = listener[0] if added else listener[1]
+			if callback: callback(entity, component)
+
+	def create_entity(self, *components):
+		entity = super().create_entity(*components)
+		if self._listeners:
+			for component in components:
+				self._notify( entity, type(component), component, True )
+		return entity
+
+	def add_component(self, entity, component_instance, type_alias = None):
+		component_type = type_alias or type(component_instance)
+		previous = self._entities[entity].get(component_type)
+		super().add_component(entity, component_instance, type_alias)
+		if previous is not None: self._notify( entity, component_type, previous, False )
+		self._notify( entity, component_type, component_instance, True )
+
+	def remove_component(self, entity, component_type):
+		component = super().remove_component(entity, component_type)
+		self._notify( entity, component_type, component, False )
+		return component
+
+	def delete_entity(self, entity, immediate = False):
+		if immediate: self._notify_deletion(entity)
+		super().delete_entity(entity, immediate)
+
+	def _notify_deletion(self, entity):
+		if not self._listeners: return
+		for component_type, component in self._entities[entity].items():
+			self._notify( entity, component_type, component, False )
+
+	def _clear_dead_entities(self):
+		for entity in self._dead_entities:
+			self._notify_deletion(entity)
+		super()._clear_dead_entities()
+
+	def clear_database(self):
+		for entity in list(self._entities):
+			self._notify_deletion(entity)
+		super().clear_database()
@@ -1,8 +1,10 @@
 import sys
-import time
 import importlib
-import esper
+import traceback
 import pygame
+from concurrent.futures import ThreadPoolExecutor
+from code.events import event_bus
+from code.scheduler import ProcessorScheduler
 
 
 # -------------------------------------------------------------------------------------------------
@@ -11,88 +13,183 @@ import pygame
 class WorldManager():
 	"""Levels manager (esper worlds)"""
 
-	def __init__(self):
+	def __init__(self, loading_gate=None):
 		# TODO BUG? We need to set the mouse cursor visibility here otherwise it will be overwritten
 		pygame.mouse.set_visible(False)
 
 		self.worlds = {}	 	# Game levels (esper's Worlds)
+		self.schedulers = {} 	# Processors scheduler of each world
 		self.worlds_keys = []	# Levels names quick reference list
 		self.current = ""		# Current active world
 
+		# World name => keyword arguments for its module load function (e.g. map, seed)
+		self.world_options = {}
+
+		# Background loading: worlds are prepared on a worker thread (module import, map parsing, images
+		# decoding), then assembled on the main thread, one per frame, while the loading world is shown
+		self.executor 	= ThreadPoolExecutor( max_workers=1, thread_name_prefix="world-loader" )
+		self.loading 	= {} 	# World name => prepare Future, in loading order
+		self.progress 	= {} 	# World name => prepared fraction (written by the worker)
+		self.target 	= "" 	# World activated once everything has been loaded
+		self.previous 	= "" 	# World shown before loading started, shown again if the target fails to load
+		# Callable (world name, prepare Future) => whether the world can be assembled during this frame, by
+		# default as soon as it has been prepared (see code.replay: replays assemble worlds at recorded frames)
+		self.loading_gate = loading_gate
+
 		self._WORLD_PACKAGE = "code.worlds" # World modules package
+		self._LOADING_WORLD = "loading" 	# Shown while loading
+		self._LAZY_WORLDS 	= ( "pause_menu", ) 	# Loaded when first activated (see set_active)
 
 		# Register event handlers
-		esper.set_handler("game_new", self.on_game_new)
-		esper.set_handler("game_continue", self.on_game_continue)
-		esper.set_handler("quit_to_menu", self.on_quit_to_menu)
+		event_bus.subscribe("game_new", self.on_game_new)
+		event_bus.subscribe("game_continue", self.on_game_continue)
+		event_bus.subscribe("quit_to_menu", self.on_quit_to_menu)
 
 		# Setup manager instance
 		self.reset()
 
-	# TODO add error checking
-	def _load_world(self, file_name):
-		"""Load an esper.World definition from @file_name"""
-		_module = None
+	def _import_world(self, file_name):
+		"""Import (or get the already imported) world module @file_name"""
 		module_name = "{}.{}".format(self._WORLD_PACKAGE, file_name)
 
 		# Directly call module if it has already been loaded
 		if module_name in sys.modules:
-			_module = sys.modules[module_name]
+			return sys.modules[module_name]
 
 		# Dynamically load module when absent
-		else:
-			_module = importlib.import_module( ".{}".format(file_name), package=self._WORLD_PACKAGE )
+		return importlib.import_module( ".{}".format(file_name), package=self._WORLD_PACKAGE )
+
+	def _load_world(self, file_name, prepared=None):
+		"""Load an esper.World definition from @file_name"""
+		_module = self._import_world(file_name)
+		options = self.world_options.get(file_name, {})
 
 		# Load world definition
-		return _module.load(file_name)
+		if prepared is not None: return _module.load(file_name, prepared=prepared, **options)
+		return _module.load(file_name, **options)
+
+	def add_world(self, name, world):
+		"""Make @world available as @name (replacing the previous one), its event bus receives game-wide events"""
+		self.remove_world(name)
+		self.worlds[name] = world
+		if hasattr(world, "events"): event_bus.attach(world.events)
+
+	def remove_world(self, name):
+		"""Tear down world @name: its event handlers are dropped, nothing else keeps its processors alive"""
+		world = self.worlds.pop(name, None)
+		self.schedulers.pop(name, None)
+		if world is not None and hasattr(world, "events"):
+			event_bus.detach(world.events)
+			world.events.clear()
+
+	def _prepare_world(self, file_name):
+		"""Worker thread: import the world module and run its optional prepare function (no display calls)"""
+		_module = self._import_world(file_name)
+		prepare = getattr(_module, "prepare", None)
+		if not prepare: return None
+
+		def progress(value): self.progress[file_name] = value
+		return prepare(file_name, progress, **self.world_options.get(file_name, {}))
+
+	def load(self, *names):
+		"""Load worlds @names in the background then activate the last one, the loading world is shown meanwhile"""
+		for name in names:
+			self.progress[name] = 0.0
+			self.loading[name] = self.executor.submit( self._prepare_world, name )
+		self.target = names[-1]
+
+		if self.current != self._LOADING_WORLD:
+			self.previous = self.current
+			self.current = self._LOADING_WORLD
+			event_bus.post("scene_change", self.current)
+
+	def finish_loading(self):
+		"""Block until every pending world has been loaded (e.g. headless runs)"""
+		while self.loading:
+			self.update_loading( wait=True )
+
+	def update_loading(self, wait=False):
+		"""Assemble the first pending world when it has been prepared, activate the target world at the end"""
+		name, future = next( iter( self.loading.items() ) )
+		ready = future.done() if self.loading_gate is None else self.loading_gate(name, future)
+		if not wait and not ready:
+			event_bus.post( "loading_progress", sum( self.progress.values() ) / len(self.progress) )
+			return
+
+		# Surfaces conversion and entities creation (main thread), a failing world is dropped
+		del self.loading[name]
+		try:
+			self.add_world( name, self._load_world( name, future.result() ) )
+		except Exception:
+			print( "Cannot load world {}:".format(name), file=sys.stderr )
+			traceback.print_exc()
+		self.progress[name] = 1.0
+
+		if not self.loading:
+			self.progress.clear()
+			# Back to the previous world (or the main menu) when the target could not be loaded
+			self.fall_back( self.target, self.previous )
+
+	def fall_back(self, *names):
+		"""Activate the first loaded world among @names, then the main menu, then the loading world"""
+		for name in names + ( "main_menu", self._LOADING_WORLD ):
+			if name in self.worlds: break
+		self.current = name
+		event_bus.post("scene_change", self.current)
 
 	def on_game_new(self):
 		"""Create a new game"""
-		self.current = "rendering_demo"
-		self.worlds[self.current] = self._load_world(self.current)
-		time.sleep(0.2)
-		esper.dispatch_event("scene_change", self.current)
+		self.load("rendering_demo")
 
 	def on_game_continue(self):
 		"""Continue an already created game"""
 		print("Event: game_continue")
-		time.sleep(0.2)
 
 	def on_quit_to_menu(self):
 		"""Go back to main menu and quit current game"""
-		del self.worlds[self.current]
-		self.current = "main_menu"
-		time.sleep(0.2)
-		esper.dispatch_event("scene_change", self.current)
+		self.remove_world(self.current)
+		self.fall_back()
 
 	def reset(self):
 		"""Setup the manager instance"""
-		self.worlds = {} # Useful?
-		screen = pygame.display.get_surface() 		# Active display reference
-		worlds_list = [ "main_menu", "pause_menu" ] # Available worlds at startup. Note: pause_menu is temporary
+		for name in list(self.worlds): self.remove_world(name)
 
-		# Try to load each definition in the given files
-		for file_name in worlds_list:
-			world = self._load_world(file_name)
-			if world: self.worlds[file_name] = world
+		# The loading world is the only one loaded synchronously
+		self.add_world( self._LOADING_WORLD, self._load_world(self._LOADING_WORLD) )
 
 		# Quick reference list to all available worlds
 		self.worlds_keys = self.worlds.keys()
-		# Main menu is the default view
-		self.current = "main_menu"
-		# Activate default scene
-		esper.dispatch_event("scene_change", self.current)
+
+		# Main menu is the default view, other worlds (e.g. pause_menu) are loaded when first activated
+		self.load("main_menu")
 
 	def set_active(self, name):
-		"""Change active world"""
+		"""Change active world, lazily loaded worlds that are not loaded yet are loaded first (in the background)
+
+		Other worlds (e.g. rendering_demo, created by "game_new") are never loaded from here.
+		"""
 		if name in self.worlds_keys:
 			self.current = name
-			esper.dispatch_event("scene_change", name)
+			event_bus.post("scene_change", name)
+		elif name in self._LAZY_WORLDS and name not in self.loading:
+			self.load(name)
 
 	def update(self, dt):
-		"""Process currently active world"""
-		if self.current:
-			self.worlds[self.current].process(dt)
+		"""Process currently active world, @dt is the real frame time (seconds)"""
+		if not self.current: return
+
+		if self.loading: self.update_loading()
+
+		# The current world is gone (e.g. it failed to load, or has been removed)
+		if self.current not in self.worlds: self.fall_back()
+
+		# (Re)create the scheduler when the world has been (re)loaded
+		world = self.worlds[self.current]
+		scheduler = self.schedulers.get(self.current)
+		if not scheduler or scheduler.world is not world:
+			scheduler = self.schedulers[self.current] = ProcessorScheduler(world)
+
+		scheduler.update(dt)
 
 	def quit(self):
 		"""Destroy loaded worlds"""
@@ -100,6 +197,13 @@ class WorldManager():
 		self.current = None
 		# Remove elements from loaded modules
 		for world_name in self.worlds_keys:
-			sys.modules.pop("{}.{}".format(self._WORLD_PACKAGE, world_name))
+			sys.modules.pop( "{}.{}".format(self._WORLD_PACKAGE, world_name), None )
+		# Drop pending loads
+		self.executor.shutdown( wait=False, cancel_futures=True )
+		self.loading.clear()
 		# Clear worlds data
-		self.worlds.clear()
+		for name in list(self.worlds): self.remove_world(name)
+		# Stop receiving game-wide events
+		event_bus.unsubscribe("game_new", self.on_game_new)
+		event_bus.unsubscribe("game_continue", self.on_game_continue)
+		event_bus.unsubscribe("quit_to_menu", self.on_quit_to_menu)
@@ -0,0 +1,40 @@
+import pygame
+from code.components.ui import UiProgress, UiSurface, UiText
+from code.systems.ui import LoadingRendering
+from code.text import text_cache
+from code.world import World
+
+
+def load(file_name):
+	world = World()
+
+	# Active display reference
+	screen = pygame.display.get_surface()
+	screen_size = screen.get_size()
+
+	# Font size (see text_cache)
+	font_size = 64
+
+	# Entities
+	background = world.create_entity()
+	message = world.create_entity()
+	progress = world.create_entity()
+
+	# Components
+	# A greenish background
+	world.add_component( background, UiSurface( color=(218, 253, 175), size=screen_size ) )
+
+	# A warm, welcoming message
+	text = "Pippo Baudo non esiste"
+	text_surface = text_cache.render(text, font_size, (0, 0, 0))
+	text_rect = text_surface.get_rect( center = (screen_size[0]/2, screen_size[1]/2) )
+	world.add_component( message, UiText( text=text, surface=text_surface, rect=text_rect, size=font_size ) )
+
+	bar_rect = pygame.Rect( 0, 0, screen_size[0]/3, 12 )
+	bar_rect.center = ( screen_size[0]/2, screen_size[1]/2 + font_size )
+	world.add_component( progress, UiProgress( rect=bar_rect ) )
+
+	# Systems
+	world.add_processor( LoadingRendering( scene_name=file_name ) )
+
+	return world
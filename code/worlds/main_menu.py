@@ -1,19 +1,27 @@
-import esper
 import pygame
+from code.events import event_bus
 from code.systems.ui import MenuInputHandler, MenuRendering
+from code.text import text_cache
 from code.components.ui import UiButton, UiCursor, UiImage, UiItem, UiSurface, UiText
+from code.utils import decode_images
+from code.world import World
+
+
+def prepare(file_name, progress):
+	"""Worker thread part of the loading: decode the menu images"""
+	decode_images( [ "menu_cursor.png", "menu_background.png", "menu_icon_left.png", "menu_icon_right.png" ] )
+	progress(1.0)
 
 
 def load(file_name):
-	world = esper.World()
+	world = World()
 
 	# Active display reference
 	screen = pygame.display.get_surface()
 	screen_size = screen.get_size()
 
-	# Font object
+	# Font size (see text_cache)
 	font_size = 64
-	font = pygame.font.SysFont(None, font_size)
 
 	# Miscellanea
 	height = 0
@@ -42,7 +50,7 @@ def load(file_name):
 	world.add_component( background, UiSurface( color=(218, 64, 32), size=screen_size ) )
 
 	text = "Hidden Wheelchair Attack"
-	text_surface = font.render(text, True, (255, 255, 255))
+	text_surface = text_cache.render(text, font_size, (255, 255, 255))
 	text_rect = text_surface.get_rect( center = (screen_size[0]/2, screen_size[1]/4) )
 	image = UiImage( file_name="menu_background.png", size=(text_rect.w + 80, text_rect.h + 80) )
 	image.rect.center = ( screen_size[0]/2, screen_size[1]/4 )
@@ -50,37 +58,37 @@ def load(file_name):
 	world.add_component( logo, UiText( text=text, surface=text_surface, rect=text_rect, size=font_size ) )
 
 	text = "New Game"
-	text_size = font.size(text)
+	text_size = text_cache.size(text, font_size)
 	height = text_size[1] + 40 + 15
-	text_surface = font.render(text, True, (255, 255, 255))
+	text_surface = text_cache.render(text, font_size, (255, 255, 255))
 	text_rect = text_surface.get_rect( center = (screen_size[0]/2, screen_size[1]/2 + height) )
 	image = UiButton( rect=pygame.Rect( text_rect.x - 20, text_rect.y - 20, text_rect.w + 40, text_rect.h + 40 ) )
 	image.rect.center = ( screen_size[0]/2, screen_size[1]/2 + height )
 	world.add_component( button_1, image )
 	world.add_component( button_1, UiText( text=text, surface=text_surface, rect=text_rect, size=font_size ) )
-	world.add_component( button_1, UiItem( rect=image.rect, callback=lambda: esper.dispatch_event("game_new") ) )
+	world.add_component( button_1, UiItem( rect=image.rect, callback=lambda: event_bus.post("game_new") ) )
 
 	text = "Continue"
-	text_size = font.size(text)
+	text_size = text_cache.size(text, font_size)
 	height = (text_size[1] + 40 + 15) * 2
-	text_surface = font.render(text, True, (255, 255, 255))
+	text_surface = text_cache.render(text, font_size, (255, 255, 255))
 	text_rect = text_surface.get_rect( center = (screen_size[0]/2, screen_size[1]/2 + height) )
 	image = UiButton( rect=pygame.Rect( text_rect.x - 20, text_rect.y - 20, text_rect.w + 40, text_rect.h + 40 ) )
 	image.rect.center = ( screen_size[0]/2, screen_size[1]/2 + height )
 	world.add_component( button_2, image )
 	world.add_component( button_2, UiText( text=text, surface=text_surface, rect=text_rect, size=font_size ) )
-	world.add_component( button_2, UiItem( rect=image.rect, callback=lambda: esper.dispatch_event("game_continue") ) )
+	world.add_component( button_2, UiItem( rect=image.rect, callback=lambda: event_bus.post("game_continue") ) )
 
 	text = "Exit"
-	text_size = font.size(text)
+	text_size = text_cache.size(text, font_size)
 	height = (text_size[1] + 40 + 15) * 3
-	text_surface = font.render(text, True, (255, 255, 255))
+	text_surface = text_cache.render(text, font_size, (255, 255, 255))
 	text_rect = text_surface.get_rect( center = (screen_size[0]/2, screen_size[1]/2 + height) )
 	image = UiButton( rect=pygame.Rect( text_rect.x - 20, text_rect.y - 20, text_rect.w + 40, text_rect.h + 40 ) )
 	image.rect.center = ( screen_size[0]/2, screen_size[1]/2 + height )
 	world.add_component( button_3, image )
 	world.add_component( button_3, UiText( text=text, surface=text_surface, rect=text_rect, size=font_size ) )
-	world.add_component( button_3, UiItem( rect=image.rect, callback=lambda: esper.dispatch_event("quit_to_desktop") ) )
+	world.add_component( button_3, UiItem( rect=image.rect, callback=lambda: event_bus.post("quit_to_desktop") ) )
 
 	x = margin
 	y = screen_size[1] - margin
@@ -1,19 +1,26 @@
-import esper
 import pygame
 from code.components.ui import UiButton, UiCursor, UiImage, UiItem, UiSurface, UiText
 from code.systems.ui import MenuInputHandler, MenuRendering
+from code.text import text_cache
+from code.utils import decode_images
+from code.world import World
+
+
+def prepare(file_name, progress):
+	"""Worker thread part of the loading: decode the menu images"""
+	decode_images( [ "menu_cursor.png", "menu_background.png" ] )
+	progress(1.0)
 
 
 def load(file_name):
-	world = esper.World()
+	world = World()
 
 	# Active display reference
 	screen = pygame.display.get_surface()
 	screen_size = screen.get_size()
 
-	# Font object
+	# Font size (see text_cache)
 	font_size = 64
-	font = pygame.font.SysFont(None, font_size)
 
 	# Entities
 	cursor = world.create_entity()
@@ -31,7 +38,7 @@ def load(file_name):
 	center_y = screen_size[1]/2
 
 	text = "Scene 2"
-	text_surface = font.render(text, True, (255, 255, 255))
+	text_surface = text_cache.render(text, font_size, (255, 255, 255))
 	text_rect = text_surface.get_rect( center = (center_x, center_y) )
 
 	image_size = (text_rect.w + 128, text_rect.h + 128)
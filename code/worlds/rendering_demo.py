@@ -1,61 +1,62 @@
-import copy
-import random
-import esper
 import pygame
+from os.path import join
 from code.settings 				import *
 from code.systems.animation 	import AnimationController
 from code.systems.camera 		import CameraFollowManager
 from code.systems.input 		import InputHandler
-from code.systems.physics 		import PhysicsSimulation
+from code.systems.physics 		import BatchedPhysicsSimulation, PhysicsSimulation
 from code.systems.rendering 	import LayeredRendering
 from code.components.camera 	import CameraFollow
 from code.components.controller import PlayerController
 from code.components.hitbox 	import Hitbox
-from code.components.map 		import Tile, TileMap
+from code.components.map 		import Tile, TileMap, read_level
 from code.components.physics 	import PhysicsBody
 from code.components.sprite 	import StaticSprite, AnimatedSprite
+from code.map_format 			import TILE_EMPTY
+from code.baking 				import bake_row_strips, merge_cells
+from code.utils 				import decode_images, list_folder, load_image, rng
+from code.world 				import World
+
+
+MAP_LAYERS = [ "water", "ground", "main", "ceiling" ]
 
 
 # -------------------------------------------------------------------------------------------------
 
 
-def create_world_map(world):
+def create_tileset():
+
+	return {
+		0: Tile( file_name=SPRITE_WATER, 	layer=RENDERING_LAYERS["water"], 	scale_size=(48, 48), walkable=False ),
+		1: Tile( file_name=SPRITE_FLOOR, 	layer=RENDERING_LAYERS["ground"], 	walkable=True ),
+		2: Tile( file_name=SPRITE_WALL, 	layer=RENDERING_LAYERS["main"], 	walkable=False ),
+		3: Tile( file_name=SPRITE_CLOUD, 	layer=RENDERING_LAYERS["ceiling"], 	scale_size=(48, 48), walkable=True ),
+	}
+
+
+def create_world_map(world, map_name="demo", map_folder=MAPS_FOLDER, level_data=None):
 
 	# Entity
 	tilemap = world.create_entity()
 
 	# Components
-	tileset = {
-		"0": Tile( file_name=SPRITE_WATER, 	layer=RENDERING_LAYERS["water"], 	scale_size=(48, 48), walkable=False ),
-		"1": Tile( file_name=SPRITE_FLOOR, 	layer=RENDERING_LAYERS["ground"], 	walkable=True ),
-		"2": Tile( file_name=SPRITE_WALL, 	layer=RENDERING_LAYERS["main"], 	walkable=False ),
-		"3": Tile( file_name=SPRITE_CLOUD, 	layer=RENDERING_LAYERS["ceiling"], 	scale_size=(48, 48), walkable=True ),
-	}
-	tilemap_data = TileMap( file_name = "demo",
-							layers = [ "water", "ground", "main", "ceiling" ],
-							tileset = tileset )
+	tilemap_data = TileMap( file_name = map_name,
+							layers = MAP_LAYERS,
+							tileset = create_tileset(),
+							folder = map_folder,
+							level_data = level_data )
 
 	# Assign components to entity
 	world.add_component( tilemap, tilemap_data )
 
-	# Create wall entities for "main" layer
-	for i in range(tilemap_data.map_height):
-		for j in range(tilemap_data.map_width):
+	# Bake the static walls of the "main" layer (non-empty cells only): merged colliders and y-sorted row strips
+	walls = tilemap_data.level_data["main"] != TILE_EMPTY
 
-			# Empty cells
-			if tilemap_data.level_data["main"][i][j] == "-1": continue
+	for col, row, width, height in merge_cells( walls ):
+		world.create_entity( Hitbox( reference_rect = pygame.Rect( col * TILE_SIZE, row * TILE_SIZE, width * TILE_SIZE, height * TILE_SIZE ) ) )
 
-			# Entity
-			entity = world.create_entity()
-
-			# Components
-			spawn_point = ( j * TILE_SIZE + TILE_SIZE//2, i * TILE_SIZE + TILE_SIZE//2 )
-			wall_sprite = StaticSprite( file_name = "wall.png",
-										layer = RENDERING_LAYERS["main"],
-										spawn_point = spawn_point )
-			# Assign components to entity
-			world.add_component( entity, wall_sprite )
-			world.add_component( entity, Hitbox( reference_rect = wall_sprite.rect ) )
+	for surface, rect in bake_row_strips( walls, load_image( SPRITE_WALL ), WALL_STRIP_LENGTH ):
+		world.create_entity( StaticSprite( image = surface, layer = RENDERING_LAYERS["main"], spawn_point = rect.center ) )
 
 	# World dimensions
 	return ( tilemap_data.world_width, tilemap_data.world_height )
@@ -68,7 +69,7 @@ def create_player(world, world_width, world_height):
 
 	# Components
 	player_sprite = AnimatedSprite( folder 			= "dinosaur",
-									frames_table 	= copy.deepcopy(ANIM_TABLE_DINOSAUR),
+									frames_table 	= ANIM_TABLE_DINOSAUR,
 									layer 			= RENDERING_LAYERS["main"],
 									scale_size 		= ( 48, 48 ),
 									spawn_point 	= ( world_width/2 - 64, world_height/2 - 64 ),
@@ -86,9 +87,9 @@ def create_player(world, world_width, world_height):
 	return player
 
 
-def create_random_npcs(world, world_width, world_height):
+def create_random_npcs(world, world_width, world_height, number=None):
 
-	number = random.randint(5, 20)
+	if number is None: number = rng.randint(5, 20)
 
 	for i in range(number):
 
@@ -96,15 +97,15 @@ def create_random_npcs(world, world_width, world_height):
 		entity = world.create_entity()
 
 		# Components
-		scale = ( random.randint(48, 256), random.randint(48, 256) )
-		spawn = ( random.randint(scale[0], world_width), random.randint(scale[1], world_height) )
+		scale = ( rng.randint(48, 256), rng.randint(48, 256) )
+		spawn = ( rng.randint(scale[0], world_width), rng.randint(scale[1], world_height) )
 
 		# Randomly choose between an animated sprite (dinosaur) or a static one (old player)
-		if random.randint(0, 1):
+		if rng.randint(0, 1):
 			entity_sprite = AnimatedSprite(
 				duration		= ANIM_DURATION_DINOSAUR,
 				folder 			= "dinosaur",
-				frames_table 	= copy.deepcopy( ANIM_TABLE_DINOSAUR ),
+				frames_table 	= ANIM_TABLE_DINOSAUR,
 				layer 			= RENDERING_LAYERS["main"],
 				scale_size 		= scale,
 				spawn_point 	= spawn,
@@ -133,31 +134,49 @@ def create_random_npcs(world, world_width, world_height):
 # -------------------------------------------------------------------------------------------------
 
 
-def load(file_name):
-	world = esper.World()
+def prepare(file_name, progress, map_name="demo", map_folder=MAPS_FOLDER, **options):
+	"""Worker thread part of the loading: parse the map and decode images, @progress reports the completed fraction"""
+	level_data = read_level( map_name, MAP_LAYERS, map_folder )
+	progress(0.3)
+
+	# Tileset, walls, npcs and effects images
+	images = [ SPRITE_WATER, SPRITE_FLOOR, SPRITE_WALL, SPRITE_CLOUD, "fatso.png" ]
+	for folder, frames_table in [ ("dinosaur", ANIM_TABLE_DINOSAUR), ("explosions", ANIM_TABLE_EXPLOSION) ]:
+		for animation in frames_table:
+			images.extend( list_folder( join(folder, animation) ) )
+
+	for index, name in enumerate(images):
+		decode_images( [ name ] )
+		progress( 0.3 + 0.7 * (index + 1) / len(images) )
+
+	return { "level_data": level_data }
+
+
+def load(file_name, map_name="demo", map_folder=MAPS_FOLDER, npcs=None, seed=None, prepared=None):
+	world = World()
+	prepared = prepared or {}
+
+	# Repeatable npcs and effects
+	if seed is not None: rng.seed(seed)
 
 	# Active display reference
 	screen = pygame.display.get_surface()
 	screen_size = screen.get_size()
 
-	# Font object
-	font_size = 64
-	font = pygame.font.SysFont(None, font_size)
-
-	width, height = create_world_map(world)
+	width, height = create_world_map(world, map_name, map_folder, prepared.get("level_data"))
 
 	player = create_player( world, width, height )
 
-	create_random_npcs( world, width, height )
-
-	# TODO The physics simulation should run before the rendering phase but doing so will result in jitering movement
-	# TODO It works fine for now but I don't know if this sorting will result in errors later on
+	create_random_npcs( world, width, height, npcs )
 
-	# Systems
+	# Systems: simulation first, then the camera and the rendering see this frame's (interpolated) positions
 	world.add_processor( InputHandler() )
-	world.add_processor( CameraFollowManager( max_width=width, max_height=height, camera_id=player ) )
+	if PHYSICS_BATCHED:
+		world.add_processor( BatchedPhysicsSimulation( bounding_rect=(0, 0, width, height) ) )
+	else:
+		world.add_processor( PhysicsSimulation( bounding_rect=(0, 0, width, height) ) )
 	world.add_processor( AnimationController() )
+	world.add_processor( CameraFollowManager( max_width=width, max_height=height, camera_id=player ) )
 	world.add_processor( LayeredRendering( scene_name=file_name, world_width=width, world_height=height ) )
-	world.add_processor( PhysicsSimulation( bounding_rect=(0, 0, width, height) ) )
 
 	return world
@@ -12,6 +12,9 @@ print("\nWARNING: BAD AT WORK\n")
 
 try:
 	import sys
+	import time
+	# Launch time, for the time to first frame
+	started = time.perf_counter()
 	import pygame
 	from code.game_manager import GameManager
 except ImportError as importErr:
@@ -23,7 +26,22 @@ except ImportError as importErr:
 
 
 if __name__ == '__main__':
-	manager = GameManager()
+	recorder = None
+
+	# Command line only when given, kept out of the plain launch imports
+	if len(sys.argv) > 1:
+		import argparse
+		from code.replay import InputRecorder
+
+		parser = argparse.ArgumentParser(description = "Hidden Wheelchair Attack")
+		parser.add_argument("--record", default = None, help = "record the session input to this file (see benchmarks.replay)")
+		parser.add_argument("--seed", type = int, default = None, help = "recorded session rng seed (default: random)")
+		args = parser.parse_args()
+
+		if args.record: recorder = InputRecorder(args.seed)
+
+	manager = GameManager(started, recorder)
 	manager.run()
+	if recorder: recorder.save(args.record)
 	pygame.quit()
 	sys.exit(0)
@@ -0,0 +1,22 @@
+import unittest
+import pygame
+from code.components.sprite import AnimatedSprite
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class AnimatedSpriteTest(unittest.TestCase):
+
+	def test_prebuilt_frames(self):
+		"""Frames given through frames_table only (no folder) still get a rect centered at the spawn point"""
+		frame = pygame.Surface( (16, 8) )
+		sprite = AnimatedSprite( frames_table = { "idle": [ frame, frame ] }, spawn_point = (50, 50) )
+
+		self.assertEqual( sprite.status, "idle" )
+		self.assertIs( sprite.image, frame )
+		self.assertEqual( sprite.rect, pygame.Rect( 42, 46, 16, 8 ) )
+
+
+if __name__ == '__main__':
+	unittest.main()